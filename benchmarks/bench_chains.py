@@ -0,0 +1,103 @@
+"""
+Coreference chain extraction benchmark: networkx connected components vs. union-find
+
+Usage:
+    python benchmarks/bench_chains.py [--documents 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i2b2.utils.brat import Entity, Relation
+from i2b2.utils.chains import extract_chains
+
+try:
+    import networkx as nx
+except ImportError:
+    nx = None
+
+
+def build_document(nb_entities: int, chain_ratio: float = 0.6) -> tuple:
+    """
+    Build synthetic brat entities and relations, entities of a chain are linked by consecutive pairs as in the
+    brat conversion
+
+    Args:
+        nb_entities (int): number of entities in the document
+        chain_ratio (float): ratio of entities belonging to a chain
+
+    Returns:
+        (dict, dict): document entities and document relations
+    """
+
+    entities = {brat_id: Entity(brat_id, [(brat_id, brat_id + 1)], "procedure", "x")
+                for brat_id in range(1, nb_entities + 1)}
+
+    chained = random.sample(sorted(entities), int(nb_entities * chain_ratio))
+    relations = dict()
+
+    while len(chained) > 1:
+        size = random.randint(2, 6)
+        chain, chained = chained[:size], chained[size:]
+
+        for arg1, arg2 in zip(chain, chain[1:]):
+            relations[len(relations) + 1] = Relation("coref_procedure", arg2, arg1)
+
+    return entities, relations
+
+
+def extract_networkx(entities: dict, relations: dict) -> list:
+    graph = nx.Graph()
+
+    for relation in relations.values():
+        graph.add_edge(relation.arg1, relation.arg2)
+
+    chains = [sorted(component) for component in nx.connected_components(graph)]
+    chains.extend([brat_id] for brat_id in sorted(entities) if brat_id not in graph)
+
+    return chains
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", help="Number of documents", dest="documents", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+
+    if nx is None:
+        print("networkx is not installed, only the union-find is timed")
+
+    print("{:>9} {:>11} {:>14} {:>15} {:>10}".format("entities", "documents", "networkx (s)", "union-find (s)",
+                                                      "speedup"))
+
+    for nb_entities in [50, 200, 1000, 5000]:
+        documents = [build_document(nb_entities) for _ in range(args.documents)]
+
+        start = time.perf_counter()
+        union_find = [extract_chains(entities, relations) for entities, relations in documents]
+        union_find_time = time.perf_counter() - start
+
+        if nx is None:
+            print("{:>9} {:>11} {:>14} {:>15.4f} {:>10}".format(nb_entities, args.documents, "-", union_find_time,
+                                                                 "-"))
+            continue
+
+        start = time.perf_counter()
+        networkx = [extract_networkx(entities, relations) for entities, relations in documents]
+        networkx_time = time.perf_counter() - start
+
+        assert networkx == union_find
+
+        print("{:>9} {:>11} {:>14.4f} {:>15.4f} {:>9.1f}x".format(
+            nb_entities,
+            args.documents,
+            networkx_time,
+            union_find_time,
+            networkx_time / union_find_time
+        ))
@@ -0,0 +1,129 @@
+"""
+CLI startup benchmark: import cost of each sub-command of main.py, measured with `python -X importtime`
+
+Each sub-command is run with paths which do not exist: main.py imports the modules of the sub-command, then stops
+when it checks its input paths. The sub-commands are listed from the help of main.py.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 5]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_FILEPATH = os.path.join(ROOT_DIR, "main.py")
+
+# Required options of each sub-command, all of them are paths
+SUBCOMMAND_OPTIONS = {
+    "CONLL-TO-I2B2": ["--input-dir", "--output-dir"],
+    "CONVERT-MAPPING": ["--input-file", "--output-file"],
+    "CREATE-BRAT": ["--input-dir", "--mapping-file"],
+    "CREATE-CONLL": ["--input-dir"],
+    "CREATE-MAPPING": ["--source-dir", "--modified-dir", "--target-file"],
+    "PREPARE-DATA": ["--zip-dir", "--output-dir", "--correction-file"],
+    "REGROUP-FILES": ["--input-dir"],
+    "REMOVE-TYPES": ["--input-dir"],
+    "RUN-TO-CONLL": ["--input-dir", "--output-dir", "--gs-conll-dir", "--mapping-file"],
+}
+
+
+def get_subcommands() -> list:
+    """
+    List the sub-commands of main.py from its help message
+
+    Returns:
+        list: sub-command names
+    """
+
+    process = subprocess.run([sys.executable, MAIN_FILEPATH, "--help"], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+
+    return re.search(r"{([^}]+)}", process.stdout).group(1).split(",")
+
+
+def measure_imports(arguments: list) -> tuple:
+    """
+    Run main.py in a fresh interpreter and collect the import times reported by `-X importtime`
+
+    Args:
+        arguments (list): main.py arguments
+
+    Returns:
+        (float, int, list): wall-clock time of the interpreter (s), total import time (us) and (cumulative time,
+        module) tuples of every imported module
+    """
+
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", MAIN_FILEPATH] + arguments, cwd=ROOT_DIR,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    wall_time = time.perf_counter() - start
+
+    # Exit status 2: the arguments were rejected by argparse, the sub-command modules were not imported
+    if process.returncode == 2:
+        raise RuntimeError("Invalid arguments for main.py {}:\n{}".format(" ".join(arguments), process.stderr))
+
+    all_imports = list()
+    total = 0
+
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+        all_imports.append((int(cumulative), name.strip()))
+
+        # Top-level imports are not indented
+        if not name.startswith("  "):
+            total += int(cumulative)
+
+    return wall_time, total, all_imports
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="Number of runs per sub-command", dest="runs", type=int, default=5)
+    parser.add_argument("--top", help="Number of slowest imports to display", dest="top", type=int, default=5)
+    args = parser.parse_args()
+
+    missing_path = os.path.join(tempfile.mkdtemp(), "missing")
+
+    all_arguments = [("--help", ["--help"])]
+    for subcommand in get_subcommands():
+        if subcommand not in SUBCOMMAND_OPTIONS:
+            raise KeyError("Unknown sub-command, its required options must be added to the benchmark: {}".format(
+                subcommand
+            ))
+
+        all_arguments.append((subcommand, [subcommand] + [
+            item for option in SUBCOMMAND_OPTIONS[subcommand] for item in (option, missing_path)
+        ]))
+
+    print("{:<16} {:>12} {:>14}".format("sub-command", "wall (ms)", "imports (ms)"))
+
+    slowest = dict()
+
+    for subcommand, arguments in all_arguments:
+        all_runs = [measure_imports(arguments) for _ in range(args.runs)]
+
+        print("{:<16} {:>12.1f} {:>14.1f}".format(
+            subcommand,
+            1000 * min(wall_time for wall_time, _, _ in all_runs),
+            min(total for _, total, _ in all_runs) / 1000
+        ))
+
+        for cumulative, name in all_runs[-1][2]:
+            slowest[name] = max(slowest.get(name, 0), cumulative)
+
+    os.rmdir(os.path.dirname(missing_path))
+
+    print()
+    print("Slowest imports (cumulative):")
+
+    for name, cumulative in sorted(slowest.items(), key=lambda x: -x[1])[:args.top]:
+        print("{:>10.1f} ms  {}".format(cumulative / 1000, name))
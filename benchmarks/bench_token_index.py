@@ -0,0 +1,135 @@
+"""
+Entity-to-token assignment benchmark: nested token scan vs. sorted token offset index
+
+Usage:
+    python benchmarks/bench_token_index.py [--mentions 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i2b2.utils.span import get_covered_range
+
+
+def build_document(nb_tokens: int, tokens_per_sentence: int = 15) -> list:
+    """
+    Build a synthetic document with the sentence/token layout used by conll_files_task1c
+
+    Args:
+        nb_tokens (int): number of tokens in the document
+        tokens_per_sentence (int): number of tokens per sentence
+
+    Returns:
+        list: document sentences
+    """
+
+    sentences = list()
+    offset = 0
+
+    for i in range(0, nb_tokens, tokens_per_sentence):
+        tokens = list()
+        for _ in range(min(tokens_per_sentence, nb_tokens - i)):
+            length = random.randint(1, 10)
+            tokens.append({"begin": offset, "end": offset + length})
+            offset += length + 1
+
+        sentences.append({"tokens": tokens})
+
+    return sentences
+
+
+def build_mentions(sentences: list, nb_mentions: int) -> list:
+    """
+    Pick random mentions (1 to 3 tokens) within the document
+
+    Args:
+        sentences (list): document sentences
+        nb_mentions (int): number of mentions
+
+    Returns:
+        list: mention (begin, end) offsets
+    """
+
+    mentions = list()
+
+    for _ in range(nb_mentions):
+        tokens = random.choice(sentences)["tokens"]
+        first = random.randrange(len(tokens))
+        last = min(len(tokens) - 1, first + random.randint(0, 2))
+        mentions.append((tokens[first]["begin"], tokens[last]["end"]))
+
+    return mentions
+
+
+def assign_nested(sentences: list, mentions: list) -> list:
+    results = list()
+
+    for e_begin, e_end in mentions:
+        current_entity = list()
+        for s, sentence in enumerate(sentences):
+            for t, token in enumerate(sentence["tokens"]):
+                if e_begin <= token["begin"] < token["end"] <= e_end:
+                    current_entity.append((s, t))
+
+        results.append((current_entity[0], current_entity[-1]))
+
+    return results
+
+
+def assign_indexed(sentences: list, mentions: list) -> list:
+    token_begins = array("l")
+    token_ends = array("l")
+    token_positions = list()
+
+    for s, sentence in enumerate(sentences):
+        for t, token in enumerate(sentence["tokens"]):
+            token_begins.append(token["begin"])
+            token_ends.append(token["end"])
+            token_positions.append((s, t))
+
+    results = list()
+
+    for e_begin, e_end in mentions:
+        first, last = get_covered_range(e_begin, e_end, token_begins, token_ends)
+        results.append((token_positions[first], token_positions[last - 1]))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mentions", help="Number of mentions per document", dest="mentions", type=int,
+                        default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+
+    print("{:>8} {:>10} {:>14} {:>14} {:>10}".format("tokens", "mentions", "nested (s)", "indexed (s)", "speedup"))
+
+    for nb_tokens in [1000, 5000, 10000, 25000, 50000]:
+        doc_sentences = build_document(nb_tokens)
+        doc_mentions = build_mentions(doc_sentences, args.mentions)
+
+        start = time.perf_counter()
+        nested = assign_nested(doc_sentences, doc_mentions)
+        nested_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = assign_indexed(doc_sentences, doc_mentions)
+        indexed_time = time.perf_counter() - start
+
+        assert nested == indexed
+
+        print("{:>8} {:>10} {:>14.4f} {:>14.4f} {:>9.1f}x".format(
+            nb_tokens,
+            args.mentions,
+            nested_time,
+            indexed_time,
+            nested_time / indexed_time
+        ))
@@ -0,0 +1,151 @@
+"""
+Tokenizer benchmark: per-line re.split tokenization vs. whole-document tokenization (get_content_splits), with and
+without building the per-line token lists
+
+Usage:
+    python benchmarks/bench_tokenizer.py [--runs 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i2b2.utils.splits import get_content_splits
+
+WORDS = ["the", "patient", "was", "admitted", "to", "hospital", "with", "chest", "pain", ".", ",", "mg", "q.d."]
+
+
+def build_content(nb_tokens: int) -> str:
+    """
+    Build a synthetic document: lines of variable length, some of them empty or starting with whitespace, tokens
+    separated by one or two spaces or by tabs
+
+    Args:
+        nb_tokens (int): approximate number of tokens in the document
+
+    Returns:
+        str: document content
+    """
+
+    lines = list()
+    total = 0
+
+    while total < nb_tokens:
+        words = [random.choice(WORDS) for _ in range(random.randint(0, 30))]
+        lines.append(random.choice(["", "", " ", "\t"]) + random.choice([" ", " ", "  ", "\t"]).join(words))
+        total += len(words)
+
+    return "\n".join(lines) + "\n"
+
+
+def split_lines(content: str) -> dict:
+    """
+    Per-line tokenization, as done before get_content_splits: one re.split call and one tuple per chunk
+
+    Args:
+        content (str): document content
+
+    Returns:
+        dict: line number -> list of (token, begin offset, end offset) tuples
+    """
+
+    all_rets = dict()
+
+    old_global_start = 0
+    global_start = 0
+
+    for i, line in enumerate(content.splitlines(keepends=True), start=1):
+        chunks = re.split(r"[\s]", line.rstrip("\n"))
+        current_ret = list()
+
+        for j, chunk in enumerate(chunks):
+            if len(chunk) == 0:
+                if j == 0:
+                    current_ret.append((chunk, global_start, global_start))
+                    global_start += 1
+                else:
+                    global_start += 1
+            else:
+                current_ret.append((chunk, global_start, global_start + len(chunk)))
+                global_start += len(chunk) + 1
+
+        all_rets[i] = current_ret
+        old_global_start += len(line)
+        global_start = old_global_start
+
+    return all_rets
+
+
+def split_document(content: str) -> dict:
+    """
+    Whole-document tokenization, the per-line lists of (token, begin offset, end offset) tuples being built as well
+
+    Args:
+        content (str): document content
+
+    Returns:
+        dict: line number -> list of (token, begin offset, end offset) tuples
+    """
+
+    return dict(get_content_splits(content))
+
+
+def measure(function, content: str, runs: int) -> float:
+    """
+    Measure the best running time of a tokenization function
+
+    Args:
+        function (callable): tokenization function
+        content (str): document content
+        runs (int): number of runs
+
+    Returns:
+        float: best running time (s)
+    """
+
+    all_times = list()
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(content)
+        all_times.append(time.perf_counter() - start)
+
+    return min(all_times)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="Number of runs per document size", dest="runs", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+
+    print("{:>8} {:>14} {:>14} {:>10} {:>12} {:>22} {:>10}".format("tokens", "per-line (s)", "document (s)",
+                                                                  "speedup", "Mtokens/s", "document+lines (s)",
+                                                                  "speedup"))
+
+    for nb_tokens in [10000, 50000, 100000, 250000]:
+        doc_content = build_content(nb_tokens)
+
+        # Documents read from files never contain other line separators
+        assert split_lines(doc_content) == split_document(doc_content)
+
+        doc_tokens = len(get_content_splits(doc_content).begins)
+        line_time = measure(split_lines, doc_content, args.runs)
+        document_time = measure(get_content_splits, doc_content, args.runs)
+        lines_time = measure(split_document, doc_content, args.runs)
+
+        print("{:>8} {:>14.4f} {:>14.4f} {:>9.1f}x {:>12.2f} {:>22.4f} {:>9.1f}x".format(
+            doc_tokens,
+            line_time,
+            document_time,
+            line_time / document_time,
+            doc_tokens / document_time / 1e6,
+            lines_time,
+            line_time / lines_time
+        ))
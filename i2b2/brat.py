@@ -1,27 +1,29 @@
-import json
 import logging
 import os
 import re
 
 from .utils.brat import generate_brat_conf_files
+from .utils.corpus import add_artifact, get_artifact_paths, load_corpus_manifest, write_corpus_manifest
+from .utils.mapping import CharMapping, apply_char_mapping, load_char_mapping
 from .utils.misc import find_ngrams
 from .utils.path import ensure_dir, get_other_extension
+from .utils.pool import map_workers
+from .utils.splits import SPLITS_EXTENSION, dump_splits, get_content_splits
 
 
-def generate_brat_files(input_dir: str, output_dir: str, mapping_file_path: str) -> None:
+def generate_brat_files(input_dir: str, output_dir: str, mapping_file_path: str, workers: int = 1) -> None:
     """
-    Generate brat version of the corpus
+    Generate brat version of the corpus.
+    Documents are found through the corpus manifest, where brat files are then recorded. Directories are walked if
+    there is no manifest.
 
     Args:
         input_dir: working directory where ZIP files have been decompressed and sorted
         output_dir: path where brat files will be created
         mapping_file_path: mapping file with character mapping
+        workers: number of worker processes
     """
 
-    # Loading character mapping
-    with open(mapping_file_path, "r", encoding="UTF-8") as input_file:
-        char_mapping = json.load(input_file)
-
     input_path_i2b2 = os.path.join(os.path.abspath(input_dir), "gold-standard-sorted")
 
     # Setting up task1c output directories
@@ -31,254 +33,289 @@ def generate_brat_files(input_dir: str, output_dir: str, mapping_file_path: str)
     input_path_task1c_test = os.path.join(input_path_i2b2, "task1c", "test")
     output_path_task1c_test = os.path.join(output_dir, "task1c", "test")
 
-    # Converting i2b2 formatted files to brat
-    i2b2_to_brat(input_path_task1c_train, output_path_task1c_train, char_mapping)
-    i2b2_to_brat(input_path_task1c_test, output_path_task1c_test, char_mapping)
+    # Documents of each corpus part: (source directory, text filename, chain filepath) tuples
+    corpus_documents = load_corpus_manifest(input_dir)
+    train_documents = get_manifest_documents(corpus_documents, input_dir, "train")
+    test_documents = get_manifest_documents(corpus_documents, input_dir, "test")
+
+    # Converting i2b2 formatted files to brat, document character mappings are loaded on demand
+    with load_char_mapping(mapping_file_path) as char_mapping:
+        i2b2_to_brat(input_path_task1c_train, output_path_task1c_train, char_mapping, workers=workers,
+                     documents=train_documents)
+        i2b2_to_brat(input_path_task1c_test, output_path_task1c_test, char_mapping, workers=workers,
+                     documents=test_documents)
 
     # Generating configuration files for brat visualization
     generate_brat_conf_files(os.path.join(output_dir, "task1c"))
 
+    # Recording brat files in the corpus manifest
+    if train_documents is not None and test_documents is not None:
+        for doc_id, document in corpus_documents.items():
+            filename = os.path.basename(document["artifacts"]["sorted/docs"][0])
+            brat_dir = os.path.join(output_dir, "task1c", document["split"], document["source"])
+
+            for artifact, brat_filename in [("brat/txt", filename), ("brat/ann", get_other_extension(filename, "ann"))]:
+                add_artifact(document, artifact, os.path.relpath(os.path.join(brat_dir, brat_filename), input_dir),
+                             input_dir)
+
+        write_corpus_manifest(corpus_documents, input_dir)
 
-def get_splits(doc_filepath: str) -> dict:
+
+def get_manifest_documents(corpus_documents: dict, input_dir: str, split: str):
     """
-    Fetch i2b2 -> char mapping for a given document.
+    Get the documents of a corpus part from the corpus manifest
 
     Args:
-        doc_filepath (str): document filepath
+        corpus_documents (dict): corpus manifest documents, None if there is no manifest
+        input_dir (str): working directory where ZIP files have been decompressed and sorted
+        split (str): corpus part (train or test)
 
     Returns:
-        dict: mapping
+        list: (source directory, text filename, chain filepath) tuples, None if documents are not in the manifest
     """
 
-    all_rets = dict()
-
-    old_global_start = 0
-    global_start = 0
-
-    with open(doc_filepath, "r", encoding="UTF-8") as input_file:
-        for i, line in enumerate(input_file, start=1):
-            chunks = re.split(r"[\s]", line.rstrip("\n"))
-            current_ret = list()
-
-            for j, chunk in enumerate(chunks):
-                if len(chunk) == 0:
-                    if j == 0:
-                        current_ret.append((
-                            chunk, global_start, global_start + len(chunk)
-                        ))
-                        global_start += len(chunk) + 1
-
-                    elif j != 0:
-                        global_start += 1
-                        continue
-                else:
-                    current_ret.append((
-                        chunk, global_start, global_start + len(chunk)
-                    ))
-                    global_start += len(chunk) + 1
+    if corpus_documents is None:
+        return None
 
-            all_rets[i] = current_ret
-            old_global_start += len(line)
-            global_start = old_global_start
+    all_paths = get_artifact_paths(corpus_documents, ["sorted/docs", "sorted/chains"], input_dir, split=split)
+    if all_paths is None:
+        return None
 
-    return all_rets
+    return [
+        (document["source"], os.path.basename(doc_filepath), chain_filepath)
+        for _, document, (doc_filepath, chain_filepath) in all_paths
+    ]
 
 
-def i2b2_to_brat(input_dir: str, output_dir: str, char_mapping: dict) -> None:
+def i2b2_to_brat(input_dir: str, output_dir: str, char_mapping: CharMapping, workers: int = 1,
+                 documents: list = None) -> None:
     """
-    Convert an i2b2 corpus part to brat
+    Convert an i2b2 corpus part to brat.
+    Documents are independent from each other and can be converted by several worker processes.
 
     Args:
         input_dir (str): input i2b2 corpus
         output_dir (str): output directory where brat file will be created
-        char_mapping (dict): char mapping used during text file copying process
+        char_mapping (CharMapping): char mapping used during text file copying process
+        workers (int): number of worker processes
+        documents (list): (source directory, text filename, chain filepath) tuples, the directories of the input
+            corpus are listed if None
+    """
+
+    if documents is None:
+        all_dirnames = os.listdir(input_dir)
+        documents = [
+            (dirname, filename, None)
+            for dirname in all_dirnames
+            for filename in os.listdir(os.path.join(input_dir, dirname, "docs"))
+        ]
+    else:
+        all_dirnames = sorted({dirname for dirname, _, _ in documents})
+
+    for dirname in all_dirnames:
+        ensure_dir(os.path.join(output_dir, dirname))
+
+    all_documents = [
+        (input_dir, os.path.join(output_dir, dirname), dirname, filename, char_mapping.get(filename), chain_file_path)
+        for dirname, filename, chain_file_path in documents
+    ]
+
+    for _ in map_workers(i2b2_document_to_brat, *zip(*all_documents), workers=workers):
+        pass
+
+
+def i2b2_document_to_brat(input_dir: str, current_output_dir: str, dirname: str, filename: str,
+                          doc_char_mapping: list = None, chain_file_path: str = None) -> None:
+    """
+    Convert one i2b2 document to brat
+
+    Args:
+        input_dir (str): input i2b2 corpus
+        current_output_dir (str): output directory where brat files will be created
+        dirname (str): corpus subdirectory where the document is stored
+        filename (str): document filename
+        doc_char_mapping (list): runs of replaced characters of the document, None if no character needs to be
+            replaced
+        chain_file_path (str): chain filepath, looked up in the chains directory if None
     """
 
     # Matching regex for concept
     regex_concept = re.compile(r'^c="(.*)" (\d+):(\d+) (\d+):(\d+)\|\|t="(.*)"$')
 
-    for dirname in os.listdir(input_dir):
-        # Computing current output_dir for current processed dir
-        current_output_dir = os.path.join(output_dir, dirname)
-        ensure_dir(current_output_dir)
-
-        # Computing source directory paths
-        doc_dir = os.path.join(input_dir, dirname, "docs")
-        concepts_dir = os.path.join(input_dir, dirname, "concepts")
-        chains_dir = os.path.join(input_dir, dirname, "chains")
-
-        for filename in os.listdir(doc_dir):
-            concept_annotations = dict()
-
-            concept_file_path = os.path.join(concepts_dir, get_other_extension(filename, "con"))
-            chain_file_path = os.path.join(chains_dir, get_other_extension(filename, "chains"))
+    # Computing source directory paths
+    doc_dir = os.path.join(input_dir, dirname, "docs")
+    concepts_dir = os.path.join(input_dir, dirname, "concepts")
+    chains_dir = os.path.join(input_dir, dirname, "chains")
+
+    concept_annotations = dict()
+
+    concept_file_path = os.path.join(concepts_dir, get_other_extension(filename, "con"))
+
+    if chain_file_path is None:
+        chain_file_path = os.path.join(chains_dir, get_other_extension(filename, "chains"))
+
+        if not os.path.isfile(chain_file_path):
+            chain_file_path = os.path.join(chains_dir, get_other_extension(filename, "txt.chains"))
+
+    with open(concept_file_path, "r", encoding="UTF-8") as con_file:
+        for line in con_file:
+            match = regex_concept.match(line)  # Match a concept
+
+            if match:
+                concept_str = match.group(1)
+                concept_line_start = int(match.group(2))
+                concept_start = int(match.group(3))
+                concept_line_end = int(match.group(4))
+                concept_end = int(match.group(5))
+                concept_type = match.group(6)
+
+                if concept_line_start not in concept_annotations:
+                    concept_annotations[concept_line_start] = list()
+
+                payload = (concept_line_start, concept_start, concept_line_end, concept_end, concept_str,
+                           concept_type)
+
+                if payload in concept_annotations[concept_line_start]:
+                    logging.info("Skipping one mention in {} (already exists): {}".format(
+                        os.path.join(dirname, filename),
+                        line.rstrip("\n")
+                    ))
+
+                # Appending the concept to the line
+                concept_annotations[concept_line_start].append((
+                    concept_line_start, concept_start, concept_line_end, concept_end, concept_str, concept_type
+                ))
+
+        pairs = list()
+
+        # Fetching coreference pairs
+        with open(chain_file_path, "r", encoding="UTF-8") as ch_file:
+            for line in ch_file:
+                concepts = line.split("||")
+
+                # Extracting chain type
+                type_chain_str = concepts[-1]
+                type_chain = re.match(r"t=\"coref\s(.*)\"", type_chain_str).group(1)
+
+                regex_mention = re.compile(r"c=\"(.*)\" (\d+):(\d+) (\d+):(\d+)")
+
+                # Creating mention pairs by going over concept ngrams
+                for mention_1_str, mention_2_str in find_ngrams(concepts[:-1], 2):
+                    match_1 = regex_mention.match(mention_1_str)
+                    match_2 = regex_mention.match(mention_2_str)
+
+                    match_1_str = match_1.group(1).lower()
+                    match_2_str = match_2.group(1).lower()
+
+                    item_1 = "{}#{}:{}#{}:{}".format(
+                        match_1_str,
+                        match_1.group(2),
+                        match_1.group(3),
+                        match_1.group(4),
+                        match_1.group(5)
+                    )
+
+                    item_2 = "{}#{}:{}#{}:{}".format(
+                        match_2_str,
+                        match_2.group(2),
+                        match_2.group(3),
+                        match_2.group(4),
+                        match_2.group(5)
+                    )
+
+                    pairs.append((item_1, item_2, "coref_{}".format(type_chain)))
+
+    # Setting up target filenames
+    target_txt_filename = os.path.join(current_output_dir, filename)
+    target_ann_filename = os.path.join(current_output_dir, get_other_extension(filename, "ann"))
+
+    # Reading text file content (UTF-8), the document is read once and processed in memory
+    with open(os.path.join(doc_dir, filename), "r", encoding="UTF-8") as input_file:
+        content = input_file.read()
+
+    # Fetching sentence and token offsets following the i2b2 format, before any character replacement
+    all_rets = get_content_splits(content)
+
+    # Replacing characters when necessary
+    if doc_char_mapping is not None:
+        content = apply_char_mapping(content, doc_char_mapping)
+
+    # Dumping content to target files
+    with open(target_txt_filename, "w", encoding="UTF-8") as output_file:
+        output_file.write(content)
+
+    # Caching the tokenization of the brat text file for the CoNLL conversion, the document is only tokenized again
+    # if characters were replaced
+    brat_splits = all_rets if doc_char_mapping is None else get_content_splits(content)
+    dump_splits(brat_splits, os.path.join(current_output_dir, get_other_extension(filename, SPLITS_EXTENSION)))
+
+    brat_entities = dict()
+
+    with open(target_ann_filename, "w", encoding="UTF-8") as output_file:
+        id_entity_counter = 1
+        id_relation_counter = 1
+
+        for line_counter in all_rets:
+            if line_counter in concept_annotations:
+                for concept_line_start, concept_token_start, concept_line_end, concept_token_end, \
+                    concept_str, concept_type in concept_annotations[line_counter]:
+
+                    current_concept_start = concept_token_start
+                    current_concept_end = concept_token_end
+
+                    try:
+                        entity_start = all_rets.begins[all_rets.get_token_position(concept_line_start,
+                                                                                   current_concept_start)]
+                        entity_end = all_rets.ends[all_rets.get_token_position(concept_line_end, current_concept_end)]
+                        entity_str = content[entity_start:entity_end]
+                        entity_type = concept_type
+                    except:
+                        print(all_rets[concept_line_start])
+                        print(concept_line_start, current_concept_start, current_concept_end)
+                        raise
+
+                    if entity_start >= entity_end:
+                        print(filename)
+                        print(all_rets[concept_line_start])
+                        print(concept_line_start, current_concept_start, current_concept_end)
+
+                    # Computing entity hash for brat-entity-id mapping
+                    entity_hash = "{}#{}:{}#{}:{}".format(
+                        concept_str.lower(),
+                        concept_line_start,
+                        concept_token_start,
+                        concept_line_end,
+                        concept_token_end
+                    )
+
+                    entity_str_tmp = entity_str.lstrip()
+                    diff = len(entity_str) - len(entity_str_tmp)
+                    if diff > 0:
+                        entity_start += diff
+                        entity_str = entity_str[diff:]
+
+                    entity_str_tmp = entity_str.lstrip()
+                    diff = len(entity_str) - len(entity_str_tmp)
+                    if diff > 0:
+                        entity_end -= diff
+
+                    brat_entities[entity_hash] = id_entity_counter
+
+                    output_file.write("T{}\t{} {}\t{}\n".format(
+                        id_entity_counter,
+                        entity_type,
+                        "{} {}".format(entity_start, entity_end),
+                        entity_str
+                    ))
+
+                    id_entity_counter += 1
+
+        for item_1, item_2, rel_type in pairs:
+            output_file.write("R{}\t{} Arg1:T{} Arg2:T{}\n".format(
+                id_relation_counter,
+                rel_type,
+                brat_entities[item_2],
+                brat_entities[item_1]
+            ))
 
-            if not os.path.isfile(chain_file_path):
-                chain_file_path = os.path.join(chains_dir, get_other_extension(filename, "txt.chains"))
-
-            with open(concept_file_path, "r", encoding="UTF-8") as con_file:
-                for line in con_file:
-                    match = regex_concept.match(line)  # Match a concept
-
-                    if match:
-                        concept_str = match.group(1)
-                        concept_line_start = int(match.group(2))
-                        concept_start = int(match.group(3))
-                        concept_line_end = int(match.group(4))
-                        concept_end = int(match.group(5))
-                        concept_type = match.group(6)
-
-                        if concept_line_start not in concept_annotations:
-                            concept_annotations[concept_line_start] = list()
-
-                        payload = (concept_line_start, concept_start, concept_line_end, concept_end, concept_str,
-                                   concept_type)
-
-                        if payload in concept_annotations[concept_line_start]:
-                            logging.info("Skipping one mention in {} (already exists): {}".format(
-                                os.path.join(dirname, filename),
-                                line.rstrip("\n")
-                            ))
-
-                        # Appending the concept to the line
-                        concept_annotations[concept_line_start].append((
-                            concept_line_start, concept_start, concept_line_end, concept_end, concept_str, concept_type
-                        ))
-
-                pairs = list()
-
-                # Fetching coreference pairs
-                with open(chain_file_path, "r", encoding="UTF-8") as ch_file:
-                    for line in ch_file:
-                        concepts = line.split("||")
-
-                        # Extracting chain type
-                        type_chain_str = concepts[-1]
-                        type_chain = re.match(r"t=\"coref\s(.*)\"", type_chain_str).group(1)
-
-                        regex_mention = re.compile(r"c=\"(.*)\" (\d+):(\d+) (\d+):(\d+)")
-
-                        # Creating mention pairs by going over concept ngrams
-                        for mention_1_str, mention_2_str in find_ngrams(concepts[:-1], 2):
-                            match_1 = regex_mention.match(mention_1_str)
-                            match_2 = regex_mention.match(mention_2_str)
-
-                            match_1_str = match_1.group(1).lower()
-                            match_2_str = match_2.group(1).lower()
-
-                            item_1 = "{}#{}:{}#{}:{}".format(
-                                match_1_str,
-                                match_1.group(2),
-                                match_1.group(3),
-                                match_1.group(4),
-                                match_1.group(5)
-                            )
-
-                            item_2 = "{}#{}:{}#{}:{}".format(
-                                match_2_str,
-                                match_2.group(2),
-                                match_2.group(3),
-                                match_2.group(4),
-                                match_2.group(5)
-                            )
-
-                            pairs.append((item_1, item_2, "coref_{}".format(type_chain)))
-
-            # Setting up target filenames
-            target_txt_filename = os.path.join(current_output_dir, filename)
-            target_ann_filename = os.path.join(current_output_dir, get_other_extension(filename, "ann"))
-
-            # Reading text file content (UTF-8)
-            with open(os.path.join(doc_dir, filename), "r", encoding="UTF-8") as input_file:
-                content = input_file.read()
-
-            # Replacing characters when necessary
-            if filename in char_mapping:
-                for idx, (source, target) in char_mapping[filename].items():
-                    content = content[:int(idx)] + target + content[int(idx) + 1:]
-                    assert len(target) == len(source)
-
-            # Dumping content to target files
-            with open(target_txt_filename, "w", encoding="UTF-8") as output_file:
-                output_file.write(content)
-
-            # Re-reading file from disk
-            with open(target_txt_filename, "r", encoding="UTF-8") as input_file:
-                content = input_file.read()
-
-            brat_entities = dict()
-
-            with open(os.path.join(doc_dir, filename), "r", encoding="UTF-8") as txt_file:
-                with open(target_ann_filename, "w", encoding="UTF-8") as output_file:
-
-                    all_rets = get_splits(os.path.join(doc_dir, filename))
-
-                    line_counter = 1
-                    id_entity_counter = 1
-                    id_relation_counter = 1
-
-                    for _ in txt_file:
-                        if line_counter in concept_annotations:
-                            for concept_line_start, concept_token_start, concept_line_end, concept_token_end, \
-                                concept_str, concept_type in concept_annotations[line_counter]:
-
-                                current_concept_start = concept_token_start
-                                current_concept_end = concept_token_end
-
-                                try:
-                                    entity_start = all_rets[concept_line_start][current_concept_start][1]
-                                    entity_end = all_rets[concept_line_end][current_concept_end][2]
-                                    entity_str = content[entity_start:entity_end]
-                                    entity_type = concept_type
-                                except:
-                                    print(all_rets[concept_line_start])
-                                    print(concept_line_start, current_concept_start, current_concept_end)
-                                    raise
-
-                                if entity_start >= entity_end:
-                                    print(filename)
-                                    print(all_rets[concept_line_start])
-                                    print(concept_line_start, current_concept_start, current_concept_end)
-
-                                # Computing entity hash for brat-entity-id mapping
-                                entity_hash = "{}#{}:{}#{}:{}".format(
-                                    concept_str.lower(),
-                                    concept_line_start,
-                                    concept_token_start,
-                                    concept_line_end,
-                                    concept_token_end
-                                )
-
-                                entity_str_tmp = entity_str.lstrip()
-                                diff = len(entity_str) - len(entity_str_tmp)
-                                if diff > 0:
-                                    entity_start += diff
-                                    entity_str = entity_str[diff:]
-
-                                entity_str_tmp = entity_str.lstrip()
-                                diff = len(entity_str) - len(entity_str_tmp)
-                                if diff > 0:
-                                    entity_end -= diff
-
-                                brat_entities[entity_hash] = id_entity_counter
-
-                                output_file.write("T{}\t{} {}\t{}\n".format(
-                                    id_entity_counter,
-                                    entity_type,
-                                    "{} {}".format(entity_start, entity_end),
-                                    entity_str
-                                ))
-
-                                id_entity_counter += 1
-
-                        line_counter += 1
-
-                    for item_1, item_2, rel_type in pairs:
-                        output_file.write("R{}\t{} Arg1:T{} Arg2:T{}\n".format(
-                            id_relation_counter,
-                            rel_type,
-                            brat_entities[item_2],
-                            brat_entities[item_1]
-                        ))
-
-                        id_relation_counter += 1
+            id_relation_counter += 1
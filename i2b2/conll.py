@@ -1,28 +1,49 @@
+import json
+import mmap
 import os
 import re
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from contextlib import ExitStack
+from itertools import compress, repeat
+from operator import itemgetter, ne
 from typing import DefaultDict, List, Set, Tuple
 
-import networkx as nx
-from sklearn.model_selection import train_test_split
-
 from .utils.brat import parse_ann_file
+from .utils.chains import extract_chains
+from .utils.folds import DEFAULT_SEED, DEFAULT_SPLIT_CONFIG, check_split_names, get_dev_folds
 from .utils.path import ensure_dir, remove_abs, get_other_extension
-from .utils.span import overlap
+from .utils.pool import get_process_pool, map_workers
+from .utils.span import get_covered_range
+from .utils.splits import Splits, TokenView, get_cached_splits
 
 
-def create_conll_files(brat_dir: str, output_dir: str) -> None:
+def create_conll_files(brat_dir: str, output_dir: str, workers: int = 1, split_configs: list = None,
+                       seed: int = DEFAULT_SEED, write_documents: bool = True, source_filepaths: list = None) -> None:
     """
-    Create CoNLL-formatted files
+    Create CoNLL-formatted files.
+    Training documents are split deterministically between train and dev: the default split is written to train.conll
+    and dev.conll, additional named splits are written to splits/<name> (one subdirectory per fold for k-fold splits).
+    All aggregated files are written in a single pass over the converted documents.
 
     Args:
         brat_dir (str): directory where brat files are stored
         output_dir (str): directory where CoNLL files will be stored
+        workers (int): number of worker processes
+        split_configs (list): additional (name, split type, dev size or number of folds) split configurations
+        seed (int): seed mixed with document IDs for the train/dev splits
+        write_documents (bool): write one CoNLL file per document besides the aggregated files
+        source_filepaths (list): (brat ann filepath, brat txt filepath) tuples of the documents (e.g. from the corpus
+            manifest), the brat directory is walked if None
 
     Returns:
         None
     """
 
+    all_split_configs = [DEFAULT_SPLIT_CONFIG] + list(split_configs or list())
+    check_split_names(all_split_configs)
+
     # Setting up paths
     task1c_input_brat_dir = os.path.join(os.path.abspath(brat_dir), "task1c")
     task1c_output_dir = os.path.join(os.path.abspath(output_dir), "task1c")
@@ -30,495 +51,620 @@ def create_conll_files(brat_dir: str, output_dir: str) -> None:
     ensure_dir(task1c_output_dir)
 
     # CoNLL file creation for task1c
-    conll_files_task1c(
+    all_documents = conll_files_task1c(
         brat_dir=task1c_input_brat_dir,
-        output_dir=task1c_output_dir
+        output_dir=task1c_output_dir,
+        workers=workers,
+        write_documents=write_documents,
+        source_filepaths=source_filepaths
     )
 
-    for dirname in os.listdir(task1c_output_dir):
-        if dirname == "train":
-            target_conll_file_train = os.path.join(task1c_output_dir, "train.conll")
-            target_conll_file_dev = os.path.join(task1c_output_dir, "dev.conll")
+    # Fetching corpus part of each document
+    all_parts = list()
+    for target_conll_file, _ in all_documents:
+        dirname = os.path.relpath(target_conll_file, task1c_output_dir).split(os.sep)[0]
+        if dirname not in ["train", "test"]:
+            raise Exception("Unknown corpus part: {}".format(dirname))
 
-            all_files = list()
+        all_parts.append(dirname)
 
-            for root, dirs, files in os.walk(os.path.join(task1c_output_dir, dirname)):
-                for filename in files:
-                    if re.match(r"^.*\.conll$", filename):
-                        all_files.append(os.path.join(root, filename))
+    train_ids = [
+        os.path.splitext(os.path.basename(target_conll_file))[0]
+        for (target_conll_file, _), dirname in zip(all_documents, all_parts) if dirname == "train"
+    ]
 
-            train_files, dev_files = train_test_split(all_files, random_state=42, test_size=0.2)
+    # Computing aggregated files of each training document
+    train_targets = [list() for _ in train_ids]
+    all_targets = list()
 
-            with open(target_conll_file_train, "w", encoding="UTF-8") as output_file:
-                for filename in train_files:
-                    with open(filename, "r", encoding="UTF-8") as input_file:
-                        for line in input_file:
-                            output_file.write(line)
+    if len(train_ids) > 0:
+        for name, split_type, value in all_split_configs:
+            split_dir = os.path.join(task1c_output_dir, "splits", name) if name else task1c_output_dir
 
-            with open(target_conll_file_dev, "w", encoding="UTF-8") as output_file:
-                for filename in dev_files:
-                    with open(filename, "r", encoding="UTF-8") as input_file:
-                        for line in input_file:
-                            output_file.write(line)
+            for fold_name, is_dev in get_dev_folds(train_ids, split_type, value, seed=seed):
+                fold_dir = os.path.join(split_dir, fold_name) if fold_name else split_dir
 
-        elif dirname == "test":
-            target_conll_file = os.path.join(task1c_output_dir, "{}.conll".format(dirname))
-            with open(target_conll_file, "w", encoding="UTF-8") as output_file:
-                for root, dirs, files in os.walk(os.path.join(task1c_output_dir, dirname)):
-                    for filename in files:
-                        if re.match(r"^.*\.conll$", filename):
-                            with open(os.path.join(root, filename), "r", encoding="UTF-8") as input_file:
-                                for line in input_file:
-                                    output_file.write(line)
+                target_conll_file_train = os.path.join(fold_dir, "train.conll")
+                target_conll_file_dev = os.path.join(fold_dir, "dev.conll")
+                all_targets.extend([target_conll_file_train, target_conll_file_dev])
 
-        else:
-            raise Exception
+                for targets, doc_is_dev in zip(train_targets, is_dev):
+                    targets.append(target_conll_file_dev if doc_is_dev else target_conll_file_train)
+
+    target_conll_file_test = os.path.join(task1c_output_dir, "test.conll")
+    if "test" in all_parts:
+        all_targets.append(target_conll_file_test)
+
+    # Writing all aggregated files in one pass, along with their document index
+    with ExitStack() as stack:
+        output_files = dict()
+        all_indexes = dict()
+        for target_conll_file in all_targets:
+            ensure_dir(os.path.dirname(target_conll_file))
+            output_files[target_conll_file] = stack.enter_context(
+                open(target_conll_file, "w", encoding="UTF-8")
+            )
+            all_indexes[target_conll_file] = list()
+
+        train_targets = iter(train_targets)
+
+        for (_, block), dirname in zip(all_documents, all_parts):
+            targets = next(train_targets) if dirname == "train" else [target_conll_file_test]
+            entry = get_conll_index_entry(block)
+
+            for target_conll_file in targets:
+                output_files[target_conll_file].write(block)
+                all_indexes[target_conll_file].append(entry)
+
+    for target_conll_file, entries in all_indexes.items():
+        write_conll_index(entries, target_conll_file)
 
 
 def conll_files_task1c(brat_dir: str = None,
-                       output_dir: str = None) -> None:
+                       output_dir: str = None,
+                       workers: int = 1,
+                       write_documents: bool = True,
+                       source_filepaths: list = None) -> list:
     """
-    Create CoNLL-formatted files for task 1C
+    Create CoNLL-formatted files for task 1C.
+    Documents are converted in a deterministic order (sorted by path), possibly by several worker processes, and
+    written by the calling process as soon as they are available.
 
     Args:
         brat_dir (str): directory where brat files are stored
         output_dir (str): directory where CoNLL files will be stored
+        workers (int): number of worker processes
+        write_documents (bool): write one CoNLL file per document, otherwise documents are only returned
+        source_filepaths (list): (brat ann filepath, brat txt filepath) tuples of the documents stored in brat_dir, the
+            brat directory is walked if None
 
     Returns:
-        None
+        list: (CoNLL filepath, serialized document) tuples
     """
 
-    for root, dirs, files in os.walk(os.path.abspath(brat_dir)):
-        for filename in files:
-            if re.match(r"^.*\.ann$", filename):
+    all_sources = list()
 
-                subdir = remove_abs(re.sub(re.escape(os.path.abspath(brat_dir)), "", root))
+    if source_filepaths is not None:
+        for source_ann_filepath, source_txt_filepath in source_filepaths:
+            subdir = os.path.relpath(os.path.dirname(source_ann_filepath), os.path.abspath(brat_dir))
 
-                # Setting up source paths
-                source_ann_filepath = os.path.join(root, filename)
-                source_txt_filepath = os.path.join(root, get_other_extension(filename, "txt"))
+            all_sources.append((
+                os.path.join(os.path.abspath(output_dir), subdir,
+                             get_other_extension(os.path.basename(source_ann_filepath), "conll")),
+                source_ann_filepath,
+                source_txt_filepath
+            ))
 
-                # Fetching sentence and token offsets following the i2b2 format
-                splits = get_splits(source_txt_filepath)
+    else:
+        for root, dirs, files in os.walk(os.path.abspath(brat_dir)):
+            for filename in files:
+                if re.match(r"^.*\.ann$", filename):
 
-                target_conll_dir = os.path.join(os.path.abspath(output_dir), subdir)
-                ensure_dir(target_conll_dir)
+                    subdir = remove_abs(re.sub(re.escape(os.path.abspath(brat_dir)), "", root))
 
-                # Target CoNLL file path
-                target_conll_file = os.path.join(target_conll_dir, get_other_extension(filename, "conll"))
+                    all_sources.append((
+                        os.path.join(os.path.abspath(output_dir), subdir, get_other_extension(filename, "conll")),
+                        os.path.join(root, filename),
+                        os.path.join(root, get_other_extension(filename, "txt"))
+                    ))
 
-                # Extracting sentences
-                modified_splits = get_splits(source_txt_filepath)
+    all_sources.sort()
 
-                sentences = list()
-                for line_counter, ret in modified_splits.items():
-                    if len(ret) == 0:
-                        continue
+    target_conll_files = [target_conll_file for target_conll_file, _, _ in all_sources]
+    source_ann_filepaths = [source_ann_filepath for _, source_ann_filepath, _ in all_sources]
+    source_txt_filepaths = [source_txt_filepath for _, _, source_txt_filepath in all_sources]
 
-                    new_sentence = {
-                        "tokens": list()
-                    }
-                    all_spans = list()
+    all_blocks = map_workers(brat_to_conll, source_ann_filepaths, source_txt_filepaths, workers=workers)
 
-                    for t_counter, (t_str, t_begin, t_end) in enumerate(ret):
-                        if len(t_str) == 0:
-                            continue
+    return write_conll_documents(target_conll_files, all_blocks, write_documents=write_documents)
 
-                        new_token = {
-                            "begin": t_begin,
-                            "end": t_end,
-                            "text": t_str,
-                            "conll_begin": list(),
-                            "conll_end": list(),
-                            "conll_unique": list(),
-                            "gs_tokens": get_i2b2_mapping(t_begin, t_end, splits)
-                        }
 
-                        if len(new_token["gs_tokens"]) == 0:
-                            raise Exception("One token does not have a gs mapping")
+def write_conll_documents(target_conll_files: list, all_blocks, write_documents: bool = True) -> list:
+    """
+    Write serialized CoNLL documents to disk as they become available
 
-                        all_spans.append(t_begin)
-                        all_spans.append(t_end)
+    Args:
+        target_conll_files (list): CoNLL filepaths
+        all_blocks (iterable): serialized CoNLL documents, in the same order as the filepaths
+        write_documents (bool): write documents to disk, otherwise they are only collected
 
-                        new_sentence["tokens"].append(new_token)
+    Returns:
+        list: (CoNLL filepath, serialized document) tuples
+    """
 
-                        new_sentence["begin"] = min(all_spans)
-                        new_sentence["end"] = max(all_spans)
+    all_documents = list()
 
-                    sentences.append(new_sentence)
+    for target_conll_file, block in zip(target_conll_files, all_blocks):
+        if write_documents:
+            ensure_dir(os.path.dirname(target_conll_file))
 
-                # Extracting entities, relations
-                entities, relations = parse_ann_file(source_ann_filepath)
-                extracted_chains = extract_chains_with_networkx(relations)
-                singletons = extract_singletons(entities, relations)
+            with open(target_conll_file, "w", encoding="UTF-8") as output_file:
+                output_file.write(block)
 
-                extracted_chains = list(extracted_chains) + list([[item] for item in singletons])
+        all_documents.append((target_conll_file, block))
 
-                # Setting up tokens labels
-                chain_id = 0
-                for chain in extracted_chains:
+    return all_documents
 
-                    for e_id in chain:
-                        current_entity = list()
 
-                        e_begin = entities[e_id]["spans"][0][0]
-                        e_end = entities[e_id]["spans"][0][1]
+def brat_to_conll(source_ann_filepath: str, source_txt_filepath: str) -> str:
+    """
+    Convert one brat document to CoNLL format.
+    Tokens are the non-empty chunks of the i2b2 tokenization and are kept in parallel arrays, chain labels are only
+    stored for labelled tokens.
 
-                        for s, sentence in enumerate(sentences):
-                            for t, token in enumerate(sentence["tokens"]):
-                                if e_begin <= token["begin"] < token["end"] <= e_end:
-                                    current_entity.append((s, t))
+    Args:
+        source_ann_filepath (str): brat annotation filepath
+        source_txt_filepath (str): brat text filepath
 
-                        if len(current_entity) == 1:
-                            sentences[current_entity[0][0]]["tokens"][
-                                current_entity[0][1]]["conll_unique"].append(chain_id)
+    Returns:
+        str: serialized CoNLL document
+    """
 
-                        elif len(current_entity) > 1:
-                            sentences[current_entity[0][0]]["tokens"][
-                                current_entity[0][1]]["conll_begin"].append(chain_id)
-                            sentences[current_entity[-1][0]]["tokens"][
-                                current_entity[-1][1]]["conll_end"].append(chain_id)
-                        else:
-                            raise Exception("Span problem")
+    document_id = ".".join(os.path.basename(source_ann_filepath).split(".")[:-1])
 
-                    chain_id += 1
+    # Fetching sentence and token offsets following the i2b2 format
+    _, splits = get_cached_splits(source_txt_filepath)
+    token_begins, token_ends, token_lines, token_indices = get_split_index(splits)
 
-                # Writing conll file to disk
-                with open(target_conll_file, "w", encoding="UTF-8") as output_file:
-                    output_file.write("#begin document {};\n".format(".".join(filename.split(".")[:-1])))
+    # Extracting entities, relations
+    entities, relations = parse_ann_file(source_ann_filepath)
+    extracted_chains = extract_chains(entities, relations)
 
-                    for i, sentence in enumerate(sentences, start=1):
-                        # Skipping zero-length sentences
-                        if len(sentence["tokens"]) == 0:
-                            continue
+    # Setting up tokens labels
+    labels = get_chain_labels(entities, extracted_chains, token_begins, token_ends)
 
-                        for j, token in enumerate(sentence["tokens"]):
-                            start_str = "|".join(["({}".format(item) for item in token["conll_begin"]])
-                            uniq_str = "".join(["({})".format(item) for item in token["conll_unique"]])
-                            end_str = "|".join(["{})".format(item) for item in token["conll_end"]])
+    return "".join(get_conll_lines(document_id, TokenView(splits.content, token_begins, token_ends), len(splits),
+                                   token_lines, token_indices, labels))
 
-                            if len(start_str) > 0 and len(uniq_str) > 0 and len(end_str) > 0:
-                                final_str = "{}|{}|{}".format(start_str, uniq_str, end_str)
 
-                            elif len(start_str) > 0 and len(uniq_str) > 0 and len(end_str) == 0:
-                                final_str = "{}|{}".format(start_str, uniq_str)
+def get_chain_labels(entities: dict, chains: list, token_begins: array, token_ends: array) -> dict:
+    """
+    Compute the coreference labels of the tokens covered by chain mentions
+
+    Args:
+        entities (dict): entities extracted from a brat document
+        chains (list): coreference chains (lists of entity IDs), chain IDs are their positions
+        token_begins (array): token begin offsets
+        token_ends (array): token end offsets
+
+    Returns:
+        dict: token index -> CoNLL coreference label, for labelled tokens only
+    """
 
-                            elif len(start_str) > 0 and len(uniq_str) == 0 and len(end_str) > 0:
-                                final_str = "{}|{}".format(start_str, end_str)
+    conll_begin = defaultdict(list)
+    conll_unique = defaultdict(list)
+    conll_end = defaultdict(list)
 
-                            elif len(start_str) == 0 and len(uniq_str) > 0 and len(end_str) > 0:
-                                final_str = "{}|{}".format(uniq_str, end_str)
+    for chain_id, chain in enumerate(chains):
+        for e_id in chain:
+            e_begin, e_end = entities[e_id].spans[0]
 
-                            elif len(start_str) > 0 and len(uniq_str) == 0 and len(end_str) == 0:
-                                final_str = "{}".format(start_str)
+            first, last = get_covered_range(e_begin, e_end, token_begins, token_ends)
 
-                            elif len(start_str) == 0 and len(uniq_str) == 0 and len(end_str) > 0:
-                                final_str = "{}".format(end_str)
+            if last - first == 1:
+                conll_unique[first].append(chain_id)
 
-                            elif len(start_str) == 0 and len(uniq_str) > 0 and len(end_str) == 0:
-                                final_str = "{}".format(uniq_str)
+            elif last - first > 1:
+                conll_begin[first].append(chain_id)
+                conll_end[last - 1].append(chain_id)
 
-                            else:
-                                final_str = "-"
+            else:
+                raise Exception("Span problem")
 
-                            payload = list()
-                            payload.append(i)
-                            payload.append(token["text"])
-                            payload.append(token["begin"])
-                            payload.append(token["end"])
-                            payload.append("|".join(["{}:{}".format(l, i) for l, i in token["gs_tokens"]]))
-                            payload.append(final_str)
+    labels = dict()
 
-                            output_file.write("{}\n".format("\t".join([str(item) for item in payload])))
+    for k in conll_begin.keys() | conll_unique.keys() | conll_end.keys():
+        parts = list()
 
-                        if i != len(sentences):
-                            output_file.write("\n")
+        if k in conll_begin:
+            parts.append("|".join(["({}".format(item) for item in conll_begin[k]]))
 
-                    output_file.write("#end document\n")
+        if k in conll_unique:
+            parts.append("".join(["({})".format(item) for item in conll_unique[k]]))
 
+        if k in conll_end:
+            parts.append("|".join(["{})".format(item) for item in conll_end[k]]))
 
-def get_splits(doc_filepath: str) -> dict:
+        labels[k] = "|".join(parts)
+
+    return labels
+
+
+def get_conll_lines(document_id: str, tokens: TokenView, nb_sentences: int, token_lines: array,
+                    token_indices: array, labels: dict) -> list:
     """
-    Extract character-offset--i2b2-offset mapping for a given document
+    Format the lines of a CoNLL document. Sentences are i2b2 lines: sentence IDs are line numbers and sentences
+    without tokens are skipped.
 
     Args:
-        doc_filepath: document filepath
+        document_id (str): document ID
+        tokens (TokenView): token strings and offsets
+        nb_sentences (int): number of sentences (i2b2 lines) in the document
+        token_lines (array): token i2b2 line numbers
+        token_indices (array): token i2b2 indices within their line
+        labels (dict): token index -> CoNLL coreference label, for labelled tokens only
 
     Returns:
-        dict: mapping
-
+        list: CoNLL lines
     """
-    all_rets = dict()
 
-    old_global_start = 0
-    global_start = 0
+    # Rows are formatted column-wise, unlabelled tokens get the default label
+    token_labels = map(labels.get, range(len(token_lines)), repeat("-"))
 
-    with open(doc_filepath, "r", encoding="UTF-8") as input_file:
-        for i, line in enumerate(input_file, start=1):
-            chunks = re.split(r"[\s]", line.rstrip("\n"))
-            current_ret = list()
+    token_rows = list(map("{0}\t{1}\t{2}\t{3}\t{0}:{4}\t{5}\n".format, token_lines, tokens, tokens.begins,
+                          tokens.ends, token_indices, token_labels))
 
-            for j, chunk in enumerate(chunks):
-                if len(chunk) == 0:
-                    if j == 0:
-                        current_ret.append((
-                            chunk, global_start, global_start + len(chunk)
-                        ))
-                        global_start += len(chunk) + 1
+    # Sentence boundaries: tokens following a line change and the end of the document
+    boundaries = list(compress(range(1, len(token_lines)), map(ne, token_lines[:-1], token_lines[1:])))
+    boundaries.append(len(token_lines))
 
-                    elif j != 0:
-                        global_start += 1
-                        continue
-                else:
-                    current_ret.append((
-                        chunk, global_start, global_start + len(chunk)
-                    ))
-                    global_start += len(chunk) + 1
+    lines = ["#begin document {};\n".format(document_id)]
+    previous = 0
+
+    for boundary in boundaries:
+        if boundary == 0:
+            continue
+
+        lines.extend(token_rows[previous:boundary])
 
-            all_rets[i] = current_ret
-            old_global_start += len(line)
-            global_start = old_global_start
+        # Sentences are separated by an empty line
+        if token_lines[boundary - 1] != nb_sentences:
+            lines.append("\n")
 
-    return all_rets
+        previous = boundary
 
+    lines.append("#end document\n")
 
-def get_i2b2_mapping(begin, end, splits):
+    return lines
+
+
+def get_split_index(splits: Splits) -> tuple:
     """
-    Given a character-offset, return its i2b2 offset
+    Extract the parallel offset arrays of a character-offset--i2b2-offset mapping.
+    Zero-length chunks are left out as they cannot overlap with any token.
 
     Args:
-        begin (int): character begin offset
-        end (int): character end offset
-        splits (mapping): character-offset--i2b2-offset mapping
+        splits (Splits): character-offset--i2b2-offset mapping
 
     Returns:
-        list: i2b2 offset
+        (array, array, array, array): token begin offsets, token end offsets, i2b2 line numbers and i2b2 token indices
     """
-    mapping = list()
 
-    for line_counter, ret in splits.items():
-        for i, (t_str, t_begin, t_end) in enumerate(ret):
-            if overlap(begin, end, t_begin, t_end):
-                mapping.append((line_counter, i))
+    kept = list(map(ne, splits.begins, splits.ends))
+
+    token_begins = array("i", compress(splits.begins, kept))
+    token_ends = array("i", compress(splits.ends, kept))
+    i2b2_lines = array("i", compress(splits.lines, kept))
+    i2b2_tokens = array("i", compress(splits.indices, kept))
 
-    return mapping
+    return token_begins, token_ends, i2b2_lines, i2b2_tokens
 
 
-def extract_chains_with_networkx(relations: dict) -> set:
+def conll_to_i2b2(input_conll_dir: str, output_i2b2_dir: str, workers: int = 1) -> None:
     """
-    Given a set of relations extracted from a brat document, return the coreference chains
+    Convert a set of CoNLL document into i2b2 format.
+    This is largely inspired by the allennlp implementation.
+    CoNLL files are read as streams: each document is written as soon as it has been read and is then released. With
+    several workers, the raw lines of each document are sent to a worker process which parses the document and writes
+    its files.
 
     Args:
-        relations (dict): relations extracted from a brat document
+        input_conll_dir (str): path where conll documents are stored
+        output_i2b2_dir (str): path where i2b2 documents will be stored
+        workers (int): number of worker processes
+    """
+
+    target_concept_dir = os.path.join(output_i2b2_dir, "concepts")
+    target_chain_dir = os.path.join(output_i2b2_dir, "chains")
+
+    ensure_dir(target_concept_dir)
+    ensure_dir(target_chain_dir)
+
+    all_blocks = (
+        block
+        for root, dirs, files in os.walk(os.path.abspath(input_conll_dir))
+        for filename in files if re.match(r"^.*\.conll$", filename)
+        for block in iter_conll_blocks(os.path.join(root, filename))
+    )
+
+    if workers > 1:
+        # Bounding the number of pending documents keeps the memory usage flat
+        max_pending = 4 * workers
+
+        with get_process_pool(workers) as executor:
+            pending = deque()
+            pending_ids = dict()
+
+            for block in all_blocks:
+                # A document ID appearing twice: the last version must be written last
+                document_id = get_block_document_id(block)
+                if document_id in pending_ids:
+                    pending_ids.pop(document_id).result()
+
+                if len(pending) >= max_pending:
+                    done_id, done_future = pending.popleft()
+                    done_future.result()
+
+                    # Only the IDs of pending documents are kept
+                    if pending_ids.get(done_id) is done_future:
+                        del pending_ids[done_id]
+
+                future = executor.submit(write_i2b2_block, block, target_concept_dir, target_chain_dir)
+                pending.append((document_id, future))
+                pending_ids[document_id] = future
+
+            for _, future in pending:
+                future.result()
+
+    else:
+        for block in all_blocks:
+            write_i2b2_block(block, target_concept_dir, target_chain_dir)
+
+
+def write_i2b2_block(block: List[str], target_concept_dir: str, target_chain_dir: str) -> None:
+    """
+    Parse the lines of a CoNLL document and write its i2b2 concept and chain files
+
+    Args:
+        block (list): stripped lines of the document, from "#begin document" to "#end document"
+        target_concept_dir (str): directory where i2b2 concept files are stored
+        target_chain_dir (str): directory where i2b2 chain files are stored
+    """
+
+    write_i2b2_document(parse_conll_block(block), target_concept_dir, target_chain_dir)
+
+
+def write_i2b2_document(document: "Document", target_concept_dir: str, target_chain_dir: str) -> None:
+    """
+    Write the i2b2 concept and chain files of a CoNLL document
+
+    Args:
+        document (Document): CoNLL document
+        target_concept_dir (str): directory where i2b2 concept files are stored
+        target_chain_dir (str): directory where i2b2 chain files are stored
+    """
+
+    concepts, chains = document.resolve()
+
+    # Mention strings are formatted once and shared by concept and chain files
+    mentions = dict()
+    for concept in concepts:
+        con_str, con_begin, con_end, con_type = concept
+        mentions[concept] = "c=\"{}\" {}:{} {}:{}".format(con_str, con_begin[0], con_begin[1], con_end[0], con_end[1])
+
+    concept_file_path = os.path.join(target_concept_dir, "{}.con".format(document.document_id))
+    chain_file_path = os.path.join(target_chain_dir, "{}.chains".format(document.document_id))
+
+    with open(concept_file_path, "w", encoding="UTF-8") as output_file:
+        output_file.writelines(
+            "{}||t=\"{}\"\n".format(mentions[concept], concept[3])
+            for concept in concepts
+        )
+
+    with open(chain_file_path, "w", encoding="UTF-8") as output_file:
+        output_file.writelines(
+            "{}||t=\"coref procedure\"\n".format(
+                "||".join([mentions[concept] for concept in sorted(concept_list, key=itemgetter(1))])
+            )
+            for concept_list in chains.values()
+        )
+
+
+def iter_conll_blocks(conll_file_path: str):
+    """
+    Read a CoNLL file, which may contain several documents, one document at a time without parsing it
+
+    Args:
+        conll_file_path (str): CoNLL filepath
 
     Returns:
-        set: set of coreference chains
+        generator: lists of stripped lines, from "#begin document" to "#end document". Lines of a document without
+        "#end document" line are not returned
     """
 
-    graph = nx.Graph()
-    done = set()
+    with open(conll_file_path, "r", encoding="UTF-8") as input_file:
+        block = list()
 
-    for rel_id, rel_pl in relations.items():
-        graph.add_edge(rel_pl["arg1"], rel_pl["arg2"])
-        done.add(rel_pl["arg1"])
-        done.add(rel_pl["arg2"])
+        for line in input_file:
+            line = line.strip()
+            block.append(line)
 
-    connected_components = nx.connected_components(graph)
+            if line.startswith("#end document"):
+                yield block
+                block = list()
 
-    return connected_components
 
+def get_block_document_id(block: List[str]) -> str:
+    """
+    Get the ID of the last document started in a block of CoNLL lines
 
-def extract_singletons(entities: dict, relations: dict) -> set:
+    Args:
+        block (list): stripped lines of a CoNLL document
 
-    entities_in_chains = set()
+    Returns:
+        str: document ID, None if the block does not contain any "#begin document" line
+    """
 
-    for rel_id, rel_pl in relations.items():
-        entities_in_chains.add(rel_pl["arg1"])
-        entities_in_chains.add(rel_pl["arg2"])
+    document_id = None
 
-    singletons = set()
+    for line in block:
+        if line.startswith('#begin document'):
+            document_id = re.match('#begin document (.*);', line).group(1)
 
-    for ent_id in entities:
-        if ent_id not in entities_in_chains:
-            singletons.add(ent_id)
+    return document_id
 
-    return singletons
 
+def parse_conll_block(block: List[str]) -> "Document":
+    """
+    Parse the lines of a CoNLL document
+
+    Args:
+        block (list): stripped lines of the document, from "#begin document" to "#end document"
 
-def conll_to_i2b2(input_conll_dir, output_i2b2_dir):
+    Returns:
+        Document: document
     """
-    Convert a set of CoNLL document into i2b2 format.
-    This is largely inspired by the allennlp implementation.
-    :param input_conll_dir: path where conll documents are stored
-    :param output_i2b2_dir: path where i2b2 documents will be stored
-    :return: None
+
+    conll_rows = list()
+    document = None
+
+    for line in block:
+        if line.startswith('#begin document'):
+            match = re.match('#begin document (.*);', line)
+            document = Document(match.group(1))
+
+        elif line != '' and not line.startswith('#'):
+            # Non-empty line. Collect the annotation.
+            conll_rows.append(line)
+
+        else:
+            if conll_rows:
+                document.add_sentence(conll_rows)
+                conll_rows = list()
+
+    document.pack()
+
+    return document
+
+
+def iter_conll_documents(conll_file_path: str):
     """
+    Read a CoNLL file, which may contain several documents, one document at a time
 
-    all_files: List[CoNLLFile] = list()
+    Args:
+        conll_file_path (str): CoNLL filepath
 
-    for root, dirs, files in os.walk(os.path.abspath(input_conll_dir)):
-        for filename in files:
-            if re.match(r"^.*\.conll$", filename):
-                source_conll_file = os.path.join(root, filename)
+    Returns:
+        generator: Document objects, yielded as soon as their "#end document" line is read
+    """
 
-                conll_file = CoNLLFile(conll_file_path=source_conll_file)
-                all_files.append(conll_file)
+    for block in iter_conll_blocks(conll_file_path):
+        yield parse_conll_block(block)
 
-    target_concept_dir = os.path.join(output_i2b2_dir, "concepts")
-    target_chain_dir = os.path.join(output_i2b2_dir, "chains")
 
-    ensure_dir(target_concept_dir)
-    ensure_dir(target_chain_dir)
+def get_conll_index_entry(block: str) -> tuple:
+    """
+    Get the document ID and the size of a serialized CoNLL document
 
-    for conll_file in all_files:
-        for document_id, document in conll_file.all_documents.items():
-            concepts = document.get_document_concepts_i2b2_format()
-            chains = document.get_document_chains_i2b2_format()
-
-            concept_file_path = os.path.join(target_concept_dir, "{}.con".format(document_id))
-            chain_file_path = os.path.join(target_chain_dir, "{}.chains".format(document_id))
-
-            with open(concept_file_path, "w", encoding="UTF-8") as output_file:
-                for con_str, con_begin, con_end, con_type in concepts:
-                    line_str = "c=\"{}\" {}:{} {}:{}||t=\"{}\"\n".format(
-                        con_str,
-                        con_begin[0],
-                        con_begin[1],
-                        con_end[0],
-                        con_end[1],
-                        con_type
-                    )
-
-                    output_file.write(line_str)
-
-            with open(chain_file_path, "w", encoding="UTF-8") as output_file:
-                for chain_id, concept_list in chains.items():
-                    all_concept_str = list()
-                    for con_str, con_begin, con_end, con_type in sorted(concept_list, key=lambda x: (x[1][0], x[1][1])):
-                        final_str = "c=\"{}\" {}:{} {}:{}".format(
-                            con_str,
-                            con_begin[0],
-                            con_begin[1],
-                            con_end[0],
-                            con_end[1],
-                        )
-                        all_concept_str.append(final_str)
-
-                    output_file.write("{}||t=\"coref procedure\"\n".format(
-                        "||".join(all_concept_str)
-                    ))
+    Args:
+        block (str): serialized CoNLL document, starting with its "#begin document" line
 
-    return all_files
+    Returns:
+        (str, int): document ID and size in bytes (UTF-8)
+    """
 
+    return re.match('#begin document (.*);', block).group(1), len(block.encode("UTF-8"))
 
-class CoNLLFile:
+
+def get_conll_index_path(conll_file_path: str) -> str:
     """
-    A CoNLL file may contain several documents
+    Get the path of the document index of a CoNLL file
+
+    Args:
+        conll_file_path (str): CoNLL filepath
+
+    Returns:
+        str: index filepath
     """
 
-    def __init__(self, conll_file_path=None):
+    return "{}.idx".format(conll_file_path)
 
-        self.conll_file_path = conll_file_path
-        self.all_documents = self.process_file()
 
-    def process_file(self):
-        """
-        Main method of the class. Process the file and return a dict of Document objects
-        :return: dict of Document objects
-        """
+def write_conll_index(entries, conll_file_path: str) -> None:
+    """
+    Write the document index of a CoNLL file, which maps each document ID to its byte offset and length.
+    The index is a JSON sidecar file written next to the CoNLL file.
 
-        all_documents = dict()
+    Args:
+        entries (iterable): (document ID, size in bytes) tuples, in the order in which documents were written
+        conll_file_path (str): CoNLL filepath
+    """
 
-        with open(self.conll_file_path, "r", encoding="UTF-8") as input_file:
-            conll_rows = list()
-            document_id = str()
-            document = None
+    index = dict()
+    offset = 0
 
-            for line in input_file:
-                line = line.strip()
+    for document_id, length in entries:
+        index[document_id] = [offset, length]
+        offset += length
 
-                if line.startswith('#begin document'):
-                    match = re.match('#begin document (.*);', line)
-                    document_id = match.group(1)
-                    document = Document(document_id)
+    with open(get_conll_index_path(conll_file_path), "w", encoding="UTF-8") as output_file:
+        json.dump(index, output_file)
 
-                elif line != '' and not line.startswith('#'):
-                    # Non-empty line. Collect the annotation.
-                    conll_rows.append(line)
 
-                else:
-                    if conll_rows:
-                        document.sentences.append(self._conll_rows_to_sentence(conll_rows))
-                        conll_rows = list()
+def build_conll_index(content) -> dict:
+    """
+    Index the documents of a CoNLL file by scanning its content
 
-                if line.startswith("#end document"):
-                    all_documents[document_id] = document
-                    document_id = str()
-                    document = None
+    Args:
+        content (bytes|mmap.mmap): CoNLL file content
 
-            if conll_rows:
-                # Collect any stragglers or files which might not
-                # have the '#end document' format for the end of the file.
-                document.sentences.append(self._conll_rows_to_sentence(conll_rows))
+    Returns:
+        dict: document ID -> [byte offset, length]. Documents without "#end document" line are not indexed
+    """
 
-        return all_documents
+    index = dict()
+    begin = None
 
-    def _conll_rows_to_sentence(self, conll_rows):
-        """
-        Convert a sentence extracted from the CoNLL file to a Sentence object
-        :param conll_rows: rows extracted from the file
-        :return: a Sentence object
-        """
+    for match in re.finditer(rb"^[ \t]*#(begin|end) document[^\n]*\n?", content, re.MULTILINE):
+        if match.group(1) == b"begin":
+            begin = match
 
-        # Cluster id -> List of (start_index, end_index) spans.
-        clusters: DefaultDict[int, List[Tuple[int, int]]] = defaultdict(list)
-        # Cluster id -> List of start_indices which are open for this id.
-        coref_stacks: DefaultDict[int, List[int]] = defaultdict(list)
+        elif begin is not None:
+            document_id = re.match(rb"\s*#begin document (.*);", begin.group(0)).group(1).decode("UTF-8")
+            index[document_id] = [begin.start(), match.end() - begin.start()]
+            begin = None
 
-        sentences: List[int] = list()
-        words: List[str] = list()
-        begins: List[int] = list()
-        ends: List[int] = list()
-        i2b2_mappings: List[str] = list()
+    return index
 
-        for index, row in enumerate(conll_rows):
-            conll_components = row.split()
 
-            t_sent_id = conll_components[0]
-            t_word = conll_components[1]
-            t_begin = conll_components[2]
-            t_end = conll_components[3]
+class CoNLLFile:
+    """
+    A CoNLL file may contain several documents.
+    Documents are read on demand: iterate over the file to get them one at a time, all_documents loads all of them.
+    """
 
-            i2b2 = conll_components[4].split('|')
-            t_i2b2_mapping = list()
+    def __init__(self, conll_file_path=None):
 
-            for chunk in i2b2:
-                t_i2b2_mapping.append((
-                    int(chunk.split(":")[0]),
-                    int(chunk.split(":")[1])
-                ))
+        self.conll_file_path = conll_file_path
+        self._all_documents = None
 
-            try:
-                self._process_coref_span_annotations_for_word(conll_components[-1],
-                                                              index,
-                                                              clusters,
-                                                              coref_stacks)
-            except:
-                for i in conll_rows:
-                    print(i)
-                raise
-
-            sentences.append(int(t_sent_id))
-            words.append(t_word)
-            begins.append(int(t_begin))
-            ends.append(int(t_end))
-            i2b2_mappings.append(t_i2b2_mapping)
+    def __iter__(self):
+        return iter_conll_documents(self.conll_file_path)
 
-        coref_span_tuples: Set[TypedSpan] = {(cluster_id, span)
-                                             for cluster_id, span_list in clusters.items()
-                                             for span in span_list}
+    @property
+    def all_documents(self) -> dict:
+        if self._all_documents is None:
+            self._all_documents = self.process_file()
 
-        return Sentence(sentences, words, begins, ends, i2b2_mappings, coref_span_tuples)
+        return self._all_documents
+
+    def process_file(self):
+        """
+        Process the file and return a dict of Document objects
+        :return: dict of Document objects
+        """
+
+        return {document.document_id: document for document in iter_conll_documents(self.conll_file_path)}
 
     @staticmethod
     def _process_coref_span_annotations_for_word(label: str,
@@ -570,84 +716,380 @@ class CoNLLFile:
                     clusters[cluster_id].append((start, word_index))
 
 
+class IndexedCoNLLFile(Mapping):
+    """
+    Random access to the documents of a CoNLL file, behaves like a dict mapping document IDs to Document objects.
+    The file is memory-mapped and only the requested documents are decoded and parsed, using the document index
+    written next to aggregated CoNLL files. The index is rebuilt by scanning the file if it is missing or older than
+    the file.
+    """
+
+    def __init__(self, conll_file_path: str):
+
+        self.conll_file_path = conll_file_path
+
+        self._file = open(conll_file_path, "rb")
+        self._mmap = None
+
+        # The file is closed if its index cannot be read or built (invalid index file, invalid CoNLL file)
+        try:
+            if os.fstat(self._file.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._index = self._load_index()
+        except BaseException:
+            self.close()
+            raise
+
+    def _load_index(self) -> dict:
+        """
+        Read the document index of the file, scan the file if there is no up-to-date index
+        """
+
+        index_path = get_conll_index_path(self.conll_file_path)
+
+        if os.path.isfile(index_path) and \
+                os.path.getmtime(index_path) >= os.fstat(self._file.fileno()).st_mtime:
+            with open(index_path, "r", encoding="UTF-8") as input_file:
+                return json.load(input_file)
+
+        if self._mmap is None:
+            return dict()
+
+        return build_conll_index(self._mmap)
+
+    def get_block(self, document_id: str) -> List[str]:
+        """
+        Read the lines of a document without parsing it
+
+        Args:
+            document_id (str): document ID
+
+        Returns:
+            list: stripped lines of the document, from "#begin document" to "#end document"
+        """
+
+        offset, length = self._index[document_id]
+        content = self._mmap[offset:offset + length].decode("UTF-8")
+
+        return [line.strip() for line in content.rstrip("\n").split("\n")]
+
+    def __getitem__(self, document_id: str) -> "Document":
+        return parse_conll_block(self.get_block(document_id))
+
+    def __contains__(self, document_id) -> bool:
+        return document_id in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 TypedSpan = Tuple[int, Tuple[int, int]]
 
 
 class Document:
     """
-    A coreference document
+    A coreference document, stored column-wise: integer columns are arrays indexed by token, words are stored in a
+    single string, the i2b2 mapping and coreference spans are flattened into offset and value arrays
     """
 
+    __slots__ = ("document_id", "sent_ids", "text", "word_offsets", "begins", "ends", "i2b2_offsets", "i2b2_lines",
+                 "i2b2_tokens", "i2b2_first_lines", "i2b2_first_tokens", "i2b2_last_lines", "i2b2_last_tokens",
+                 "sentence_offsets", "coref_offsets", "coref_ids", "coref_begins", "coref_ends", "_words",
+                 "_resolved")
+
     def __init__(self, document_id):
 
         self.document_id = document_id
-        self.sentences = list()
 
-    def get_document_concepts_i2b2_format(self):
+        # Token columns
+        self.sent_ids = array("i")
+        self.begins = array("i")
+        self.ends = array("i")
+
+        # Words are joined with spaces, word k spans from word_offsets[k] to word_offsets[k + 1] - 1. Words of the
+        # sentences being read are kept in a list until the document is packed
+        self.text = str()
+        self.word_offsets = array("i", [0])
+        self._words = list()
+
+        # i2b2 mapping: the (line, token) pairs of token k are stored between i2b2_offsets[k] and i2b2_offsets[k + 1]
+        self.i2b2_offsets = array("i", [0])
+        self.i2b2_lines = array("i")
+        self.i2b2_tokens = array("i")
+
+        # Smallest and largest i2b2 offsets of each token, used as concept boundaries
+        self.i2b2_first_lines = array("i")
+        self.i2b2_first_tokens = array("i")
+        self.i2b2_last_lines = array("i")
+        self.i2b2_last_tokens = array("i")
+
+        # Sentence s spans from token sentence_offsets[s] to token sentence_offsets[s + 1]
+        self.sentence_offsets = array("i", [0])
+
+        # Coreference spans (document token indices, last token included), coreference spans of sentence s are
+        # stored between coref_offsets[s] and coref_offsets[s + 1]
+        self.coref_offsets = array("i", [0])
+        self.coref_ids = array("i")
+        self.coref_begins = array("i")
+        self.coref_ends = array("i")
+
+        # Concepts and chains, computed on demand
+        self._resolved = None
+
+    def add_sentence(self, conll_rows: List[str]) -> None:
         """
-        Get i2b2 formatted concepts from the CoNLL format
-        :return: list of i2b2 formatted concepts
+        Append a sentence extracted from the CoNLL file to the document
+
+        Args:
+            conll_rows (list): rows extracted from the file
         """
 
-        all_concepts = list()
+        # Cluster id -> List of (start_index, end_index) spans.
+        clusters: DefaultDict[int, List[Tuple[int, int]]] = defaultdict(list)
+        # Cluster id -> List of start_indices which are open for this id.
+        coref_stacks: DefaultDict[int, List[int]] = defaultdict(list)
 
-        for sentence in self.sentences:
-            for chain_id, (begin, end) in sentence.coref_spans:
-                concept_str = " ".join([sentence.words[idx] for idx in range(begin, end + 1)])
-                concept_begin = sorted(sentence.i2b2_mapping[begin], key=lambda x: (x[0], x[1]))[0]
-                concept_end = sorted(sentence.i2b2_mapping[end], key=lambda x: (x[0], x[1]), reverse=True)[0]
-                concept_type = "procedure"
+        first = len(self.sent_ids)
 
-                all_concepts.append((
-                    concept_str,
-                    concept_begin,
-                    concept_end,
-                    concept_type
-                ))
+        for index, row in enumerate(conll_rows):
+            conll_components = row.split()
 
-        return all_concepts
+            self.sent_ids.append(int(conll_components[0]))
+            self._words.append(conll_components[1])
+            self.word_offsets.append(self.word_offsets[-1] + len(conll_components[1]) + 1)
+            self.begins.append(int(conll_components[2]))
+            self.ends.append(int(conll_components[3]))
 
-    def get_document_chains_i2b2_format(self):
+            i2b2_mapping = list()
+            for chunk in conll_components[4].split('|'):
+                i2b2_line, _, i2b2_token = chunk.partition(":")
+                i2b2_mapping.append((int(i2b2_line), int(i2b2_token)))
+
+            for i2b2_line, i2b2_token in i2b2_mapping:
+                self.i2b2_lines.append(i2b2_line)
+                self.i2b2_tokens.append(i2b2_token)
+
+            self.i2b2_offsets.append(len(self.i2b2_lines))
+
+            i2b2_first_line, i2b2_first_token = min(i2b2_mapping)
+            i2b2_last_line, i2b2_last_token = max(i2b2_mapping)
+
+            self.i2b2_first_lines.append(i2b2_first_line)
+            self.i2b2_first_tokens.append(i2b2_first_token)
+            self.i2b2_last_lines.append(i2b2_last_line)
+            self.i2b2_last_tokens.append(i2b2_last_token)
+
+            try:
+                CoNLLFile._process_coref_span_annotations_for_word(conll_components[-1],
+                                                                   index,
+                                                                   clusters,
+                                                                   coref_stacks)
+            except Exception as e:
+                raise ValueError("Invalid coreference annotation in document {} (sentence {}, row {}): {}".format(
+                    self.document_id, len(self.sentence_offsets), index + 1, row
+                )) from e
+
+        coref_span_tuples: Set[TypedSpan] = {(cluster_id, span)
+                                             for cluster_id, span_list in clusters.items()
+                                             for span in span_list}
+
+        # Coreference spans are stored in the iteration order of the set
+        for cluster_id, (span_begin, span_end) in coref_span_tuples:
+            self.coref_ids.append(cluster_id)
+            self.coref_begins.append(first + span_begin)
+            self.coref_ends.append(first + span_end)
+
+        self.sentence_offsets.append(len(self.sent_ids))
+        self.coref_offsets.append(len(self.coref_ids))
+
+        self._resolved = None
+
+    def pack(self) -> None:
         """
-        Get i2b2 formatted chains from the CoNLL format
-        :return: list of i2b2 formatted chains
+        Join the words of the sentences read since the last call to the document text
+        """
+
+        if len(self._words) > 0:
+            self.text = " ".join(([self.text] if len(self.text) > 0 else list()) + self._words)
+            self._words = list()
+
+    @property
+    def sentences(self) -> Tuple["Sentence", ...]:
+        """
+        Sentences of the document, built from the columnar storage on each access. The tuple is read-only: sentences
+        are added with add_sentence
         """
 
-        all_chains = defaultdict(list)
+        return tuple(Sentence(self, idx) for idx in range(len(self.sentence_offsets) - 1))
 
-        for sentence in self.sentences:
-            for chain_id, (begin, end) in sentence.coref_spans:
-                concept_str = " ".join([sentence.words[idx] for idx in range(begin, end + 1)])
-                concept_begin = sorted(sentence.i2b2_mapping[begin], key=lambda x: (x[0], x[1]))[0]
-                concept_end = sorted(sentence.i2b2_mapping[end], key=lambda x: (x[0], x[1]), reverse=True)[0]
-                concept_type = "procedure"
+    def get_text(self, first: int, last: int) -> str:
+        """
+        Get the words of a span joined with spaces
 
-                all_chains[chain_id].append((
-                    concept_str,
-                    concept_begin,
-                    concept_end,
-                    concept_type
-                ))
+        Args:
+            first (int): document index of the first word
+            last (int): document index of the last word (inclusive)
+
+        Returns:
+            str: span text
+        """
 
-        return all_chains
+        self.pack()
+
+        return self.text[self.word_offsets[first]:self.word_offsets[last + 1] - 1]
+
+    def get_i2b2_mapping(self, idx: int) -> List[Tuple[int, int]]:
+        """
+        Get the i2b2 offsets of a word
+
+        Args:
+            idx (int): document index of the word
+
+        Returns:
+            list: (line, token) i2b2 offsets
+        """
+
+        first, last = self.i2b2_offsets[idx], self.i2b2_offsets[idx + 1]
+
+        return list(zip(self.i2b2_lines[first:last], self.i2b2_tokens[first:last]))
+
+    def resolve(self) -> tuple:
+        """
+        Resolve the coreference spans of the document to i2b2 concepts and chains in a single pass. The result is
+        cached on the document.
+
+        Returns:
+            (list, dict): i2b2 formatted concepts and i2b2 formatted chains (chain ID -> concepts)
+        """
+
+        if self._resolved is None:
+            self.pack()
+
+            text = self.text
+            word_offsets = self.word_offsets
+
+            all_concepts = list()
+            all_chains = defaultdict(list)
+
+            for chain_id, begin, end in zip(self.coref_ids, self.coref_begins, self.coref_ends):
+                concept = (
+                    text[word_offsets[begin]:word_offsets[end + 1] - 1],
+                    (self.i2b2_first_lines[begin], self.i2b2_first_tokens[begin]),
+                    (self.i2b2_last_lines[end], self.i2b2_last_tokens[end]),
+                    "procedure"
+                )
+
+                all_concepts.append(concept)
+                all_chains[chain_id].append(concept)
+
+            self._resolved = (all_concepts, all_chains)
+
+        return self._resolved
+
+    def get_document_concepts_i2b2_format(self):
+        """
+        Get i2b2 formatted concepts from the CoNLL format
+        :return: list of i2b2 formatted concepts
+        """
+
+        return self.resolve()[0]
+
+    def get_document_chains_i2b2_format(self):
+        """
+        Get i2b2 formatted chains from the CoNLL format
+        :return: list of i2b2 formatted chains
+        """
+
+        return self.resolve()[1]
 
 
 class Sentence:
     """
-    CoNLL sentence
+    CoNLL sentence, view over the columns of its document. Word indices are relative to the sentence.
     """
 
-    def __init__(self,
-                 sent_ids: List[int],
-                 words: List[str],
-                 begin: List[int],
-                 end: List[int],
-                 i2b2_mapping: List[str],
-                 coref_spans: Set[TypedSpan]):
+    __slots__ = ("document", "idx")
+
+    def __init__(self, document: Document, idx: int):
+
+        self.document = document
+        self.idx = idx
+
+    @property
+    def first(self) -> int:
+        return self.document.sentence_offsets[self.idx]
+
+    @property
+    def last(self) -> int:
+        return self.document.sentence_offsets[self.idx + 1]
+
+    @property
+    def sent_ids(self) -> array:
+        return self.document.sent_ids[self.first:self.last]
+
+    @property
+    def words(self) -> List[str]:
+        return [self.get_text(idx, idx) for idx in range(self.last - self.first)]
+
+    @property
+    def begin(self) -> array:
+        return self.document.begins[self.first:self.last]
+
+    @property
+    def end(self) -> array:
+        return self.document.ends[self.first:self.last]
+
+    @property
+    def i2b2_mapping(self) -> List[List[Tuple[int, int]]]:
+        return [self.get_i2b2_mapping(idx) for idx in range(self.last - self.first)]
+
+    @property
+    def coref_spans(self) -> List[TypedSpan]:
+        document = self.document
+        first, last = document.coref_offsets[self.idx], document.coref_offsets[self.idx + 1]
+
+        return [(document.coref_ids[k], (document.coref_begins[k] - self.first, document.coref_ends[k] - self.first))
+                for k in range(first, last)]
+
+    def get_text(self, first: int, last: int) -> str:
+        """
+        Get the words of a span joined with spaces
+
+        Args:
+            first (int): sentence index of the first word
+            last (int): sentence index of the last word (inclusive)
+
+        Returns:
+            str: span text
+        """
+
+        return self.document.get_text(self.first + first, self.first + last)
+
+    def get_i2b2_mapping(self, idx: int) -> List[Tuple[int, int]]:
+        """
+        Get the i2b2 offsets of a word
+
+        Args:
+            idx (int): sentence index of the word
+
+        Returns:
+            list: (line, token) i2b2 offsets
+        """
 
-        self.sent_ids = sent_ids
-        self.words = words
-        self.begin = begin
-        self.end = end
-        self.i2b2_mapping = i2b2_mapping
-        self.coref_spans = coref_spans
+        return self.document.get_i2b2_mapping(self.first + idx)
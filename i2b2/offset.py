@@ -1,29 +1,172 @@
 import json
 import os
 
+from .utils.mapping import write_char_mapping
+from .utils.pool import map_workers
 
-def create_offset_mapping(source_dir: str, modified_dir: str, target_json_filepath: str) -> None:
+# Texts are compared block by block, differing blocks are halved until they are small enough to be scanned
+DIFF_BLOCK_SIZE = 65536
+DIFF_SCAN_SIZE = 32
+
+
+def create_offset_mapping(source_dir: str, modified_dir: str, target_json_filepath: str,
+                          mapping_format: str = "json", workers: int = 1) -> None:
     """
-    Create an offset mapping between two set of document
+    Create an offset mapping between two set of document.
+    Documents are compared in parallel and their mappings are written to the target file as soon as they are
+    available.
 
     Args:
         source_dir (str): directory containing source documents
         modified_dir (str): directory containing modified documents
         target_json_filepath (str): mapping filepath
+        mapping_format (str): mapping file format (json or binary)
+        workers (int): number of worker processes
+    """
+
+    filenames = sorted(os.listdir(os.path.abspath(source_dir)))
+
+    source_filepaths = [os.path.join(os.path.abspath(source_dir), filename) for filename in filenames]
+    modified_filepaths = [os.path.join(os.path.abspath(modified_dir), filename) for filename in filenames]
+
+    all_runs = map_workers(get_document_runs, source_filepaths, modified_filepaths, workers=workers)
+    write_offset_mapping(zip(filenames, all_runs), target_json_filepath, mapping_format)
+
+
+def write_offset_mapping(all_runs, target_filepath: str, mapping_format: str) -> None:
+    """
+    Write document mappings one after the other
+
+    Args:
+        all_runs (iterable): (filename, runs) tuples
+        target_filepath (str): mapping filepath
+        mapping_format (str): mapping file format (json or binary)
+    """
+
+    if mapping_format == "binary":
+        write_char_mapping(check_runs(all_runs), target_filepath)
+
+    elif mapping_format == "json":
+        with open(target_filepath, "w", encoding="UTF-8") as output_file:
+            output_file.write("{")
+
+            for i, (filename, runs) in enumerate(all_runs):
+                doc_mapping = dict()
+                for begin, source, target in runs:
+                    for k, source_char in enumerate(source):
+                        doc_mapping[begin + k] = (source_char, target[k:k + 1])
+
+                if i > 0:
+                    output_file.write(", ")
+
+                output_file.write("{}: {}".format(json.dumps(filename), json.dumps(doc_mapping)))
+
+            output_file.write("}")
+
+    else:
+        raise ValueError("Unknown mapping format: {}".format(mapping_format))
+
+
+def check_runs(all_runs):
+    """
+    Make sure that source and modified documents have the same number of characters
+
+    Args:
+        all_runs (iterable): (filename, runs) tuples
+
+    Returns:
+        generator: (filename, runs) tuples
+    """
+
+    for filename, runs in all_runs:
+        for begin, source, target in runs:
+            if len(source) != len(target):
+                raise ValueError("The number of characters of the modified document does not match: {}".format(
+                    filename
+                ))
+
+        yield filename, runs
+
+
+def get_document_runs(source_filepath: str, modified_filepath: str) -> list:
+    """
+    Compute the runs of modified characters between a source document and its modified version
+
+    Args:
+        source_filepath (str): source document filepath
+        modified_filepath (str): modified document filepath
+
+    Returns:
+        list: (begin offset, source string, target string) tuples. The target string of the last run is shorter
+        than the source string if the modified document is shorter
+    """
+
+    with open(source_filepath, "r", encoding="UTF-8") as input_file:
+        source_content = input_file.read()
+
+    with open(modified_filepath, "r", encoding="UTF-8") as input_file:
+        modified_content = input_file.read()
+
+    return get_diff_runs(source_content, modified_content)
+
+
+def get_diff_runs(source_content: str, modified_content: str) -> list:
+    """
+    Compute the runs of modified characters between two strings. Identical blocks are skipped with a single string
+    comparison, only the characters of differing blocks are compared one by one.
+
+    Args:
+        source_content (str): source string
+        modified_content (str): modified string
+
+    Returns:
+        list: (begin offset, source string, target string) tuples
+    """
+
+    common_length = min(len(source_content), len(modified_content))
+    positions = list()
+
+    for begin in range(0, common_length, DIFF_BLOCK_SIZE):
+        find_differences(source_content, modified_content, begin, min(begin + DIFF_BLOCK_SIZE, common_length),
+                         positions)
+
+    runs = list()
+
+    for position in positions:
+        if len(runs) > 0 and runs[-1][1] == position:
+            runs[-1][1] = position + 1
+        else:
+            runs.append([position, position + 1])
+
+    runs = [(begin, source_content[begin:end], modified_content[begin:end]) for begin, end in runs]
+
+    # Characters missing from the modified string
+    if len(source_content) > common_length:
+        runs.append((common_length, source_content[common_length:], ""))
+
+    return runs
+
+
+def find_differences(source_content: str, modified_content: str, begin: int, end: int, positions: list) -> None:
+    """
+    Collect the positions of differing characters within a block
+
+    Args:
+        source_content (str): source string
+        modified_content (str): modified string
+        begin (int): block begin offset
+        end (int): block end offset
+        positions (list): list where differing positions are appended
     """
-    mapping = dict()
 
-    for filename in os.listdir(os.path.abspath(source_dir)):
-        mapping[filename] = dict()
-        source_filepath = os.path.join(os.path.abspath(source_dir), filename)
-        modified_filepath = os.path.join(os.path.abspath(modified_dir), filename)
+    if source_content[begin:end] == modified_content[begin:end]:
+        return
 
-        source_content = open(source_filepath, "r", encoding="UTF-8").read()
-        modified_content = open(modified_filepath, "r", encoding="UTF-8").read()
+    if end - begin <= DIFF_SCAN_SIZE:
+        positions.extend(idx for idx in range(begin, end) if source_content[idx] != modified_content[idx])
+        return
 
-        for idx, source_char in enumerate(source_content):
-            if source_char != modified_content[idx:idx + 1]:
-                mapping[filename][idx] = (source_char, modified_content[idx:idx + 1])
+    middle = (begin + end) // 2
 
-    with open(target_json_filepath, "w", encoding="UTF-8") as output_file:
-        json.dump(mapping, output_file)
+    find_differences(source_content, modified_content, begin, middle, positions)
+    find_differences(source_content, modified_content, middle, end, positions)
@@ -1,11 +1,23 @@
+import hashlib
+import io
 import json
+import logging
 import os
+import posixpath
 import re
 import shutil
 import tarfile
+import time
 import zipfile
+from functools import partial
 
-from .utils.path import ensure_dir
+from .utils.corpus import build_corpus_manifest, write_corpus_manifest
+from .utils.path import copy_file_mode, ensure_dir, get_file_hash, materialize_file, remove_file
+from .utils.pool import map_workers
+
+# Manifest of the prepared files, used by incremental runs
+PREPARE_MANIFEST_FILENAME = "prepare-manifest.json"
+PREPARE_MANIFEST_VERSION = 1
 
 TASK1C_COMPRESSED_FILES = [
     "i2b2_Beth_Train_Release.tar.gz",
@@ -70,30 +82,41 @@ def copy_chain_files(input_dir: str, output_dir: str, ann_corrections: dict) ->
     """
 
     for filename in os.listdir(input_dir):
-        source_filepath = os.path.join(input_dir, filename)
+        with open(os.path.join(input_dir, filename), "rb") as input_file:
+            copy_chain_file(input_file, filename, output_dir, ann_corrections)
 
-        if re.match("^.*\.txt\.chains$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.chains".format(os.path.join(output_dir, doc_id))
 
-        elif re.match("^.*\.chains$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.chains".format(os.path.join(output_dir, doc_id))
+def copy_chain_file(input_file, filename: str, output_dir: str, ann_corrections: dict) -> str:
+    """
+    Copy one chain file.
+    Perform renaming when necessary.
+    Correct annotation according to the corrections provided.
 
-        else:
-            doc_id = filename
-            target_filepath = "{}.txt".format(os.path.join(output_dir, doc_id))
+    Args:
+        input_file: binary file object of the chain file (regular file or archive member)
+        filename (str): chain filename
+        output_dir (str): target directory where the chain file will be copied
+        ann_corrections (dict): annotation corrections
 
-        with open(source_filepath, "r", encoding="UTF-8") as input_file:
-            with open(target_filepath, "w", encoding="UTF-8") as output_file:
-                for i, line in enumerate(input_file):
-                    if doc_id in ann_corrections:
-                        if "chains" in ann_corrections[doc_id]:
-                            if str(i) in ann_corrections[doc_id]["chains"]:
-                                output_file.write(ann_corrections[doc_id]["chains"][str(i)])
-                                continue
+    Returns:
+        str: target filepath
+    """
+
+    if re.match(r"^.*\.txt\.chains$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.chains".format(os.path.join(output_dir, doc_id))
+
+    elif re.match(r"^.*\.chains$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.chains".format(os.path.join(output_dir, doc_id))
 
-                    output_file.write(line)
+    else:
+        doc_id = filename
+        target_filepath = "{}.txt".format(os.path.join(output_dir, doc_id))
+
+    copy_corrected_file(input_file, target_filepath, ann_corrections.get(doc_id, dict()).get("chains", dict()))
+
+    return target_filepath
 
 
 def copy_con_files(input_dir: str, output_dir: str, ann_corrections: dict) -> None:
@@ -109,38 +132,67 @@ def copy_con_files(input_dir: str, output_dir: str, ann_corrections: dict) -> No
     """
 
     for filename in os.listdir(input_dir):
-        source_filepath = os.path.join(input_dir, filename)
+        with open(os.path.join(input_dir, filename), "rb") as input_file:
+            copy_con_file(input_file, filename, output_dir, ann_corrections)
+
 
-        if re.match(r"^.*\.txt\.concept$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+def copy_con_file(input_file, filename: str, output_dir: str, ann_corrections: dict) -> str:
+    """
+    Copy one concept file.
+    Perform renaming when necessary.
+    Correct annotation according to the corrections provided.
 
-        elif re.match(r"^.*\.concept$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+    Args:
+        input_file: binary file object of the concept file (regular file or archive member)
+        filename (str): concept filename
+        output_dir (str): target directory where the concept file will be copied
+        ann_corrections (dict): annotation corrections
 
-        elif re.match(r"^.*\.txt\.con$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+    Returns:
+        str: target filepath
+    """
 
-        elif re.match(r"^.*\.con$", filename):
-            doc_id = filename.split(".")[0]
-            target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+    if re.match(r"^.*\.txt\.concept$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+
+    elif re.match(r"^.*\.concept$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+
+    elif re.match(r"^.*\.txt\.con$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+
+    elif re.match(r"^.*\.con$", filename):
+        doc_id = filename.split(".")[0]
+        target_filepath = "{}.con".format(os.path.join(output_dir, doc_id))
+
+    else:
+        doc_id = filename
+        target_filepath = "{}.txt".format(os.path.join(output_dir, doc_id))
+
+    copy_corrected_file(input_file, target_filepath, ann_corrections.get(doc_id, dict()).get("concepts", dict()))
+
+    return target_filepath
 
-        else:
-            doc_id = filename
-            target_filepath = "{}.txt".format(os.path.join(output_dir, doc_id))
 
-        with open(source_filepath, "r", encoding="UTF-8") as input_file:
-            with open(target_filepath, "w", encoding="UTF-8") as output_file:
-                for i, line in enumerate(input_file):
-                    if doc_id in ann_corrections:
-                        if "concepts" in ann_corrections[doc_id]:
-                            if str(i) in ann_corrections[doc_id]["concepts"]:
-                                output_file.write(ann_corrections[doc_id]["concepts"][str(i)])
-                                continue
+def copy_corrected_file(input_file, target_filepath: str, corrections: dict) -> None:
+    """
+    Copy a text file line by line, replacing the lines which have a correction
+
+    Args:
+        input_file: binary file object of the source file
+        target_filepath (str): target filepath
+        corrections (dict): corrected lines, indexed by line number (str)
+    """
 
-                    output_file.write(line)
+    # The target may be linked to other files by a previous run (see materialize_file)
+    remove_file(target_filepath)
+
+    with open(target_filepath, "w", encoding="UTF-8") as output_file:
+        for i, line in enumerate(io.TextIOWrapper(input_file, encoding="UTF-8")):
+            output_file.write(corrections.get(str(i), line))
 
 
 def copy_doc_files(input_dir: str, output_dir: str) -> None:
@@ -154,14 +206,37 @@ def copy_doc_files(input_dir: str, output_dir: str) -> None:
     """
 
     for filename in os.listdir(input_dir):
-        source_filepath = os.path.join(input_dir, filename)
+        with open(os.path.join(input_dir, filename), "rb") as input_file:
+            copy_doc_file(input_file, filename, output_dir)
 
-        if re.match(r"^.*\.txt$", filename):
-            target_filepath = os.path.join(output_dir, filename)
-        else:
-            target_filepath = "{}.txt".format(os.path.join(output_dir, filename))
 
-        shutil.copy(source_filepath, target_filepath)
+def copy_doc_file(input_file, filename: str, output_dir: str) -> str:
+    """
+    Copy one text file.
+    Perform renaming when necessary.
+
+    Args:
+        input_file: binary file object of the text file (regular file or archive member)
+        filename (str): text filename
+        output_dir (str): target directory where the text file will be copied
+
+    Returns:
+        str: target filepath
+    """
+
+    if re.match(r"^.*\.txt$", filename):
+        target_filepath = os.path.join(output_dir, filename)
+    else:
+        target_filepath = "{}.txt".format(os.path.join(output_dir, filename))
+
+    remove_file(target_filepath)
+
+    with open(target_filepath, "wb") as output_file:
+        shutil.copyfileobj(input_file, output_file)
+
+    copy_file_mode(input_file, target_filepath)
+
+    return target_filepath
 
 
 def copy_pair_files(input_dir: str, output_dir: str) -> None:
@@ -175,135 +250,509 @@ def copy_pair_files(input_dir: str, output_dir: str) -> None:
     """
 
     for filename in os.listdir(input_dir):
-        source_filepath = os.path.join(input_dir, filename)
+        with open(os.path.join(input_dir, filename), "rb") as input_file:
+            copy_pair_file(input_file, filename, output_dir)
 
-        if re.match(r"^.*\.txt\.pairs$", filename):
-            doc_id = filename.split(".")
-            target_filepath = "{}.pairs".format(os.path.join(output_dir, doc_id[0]))
 
-        else:
-            target_filepath = "{}.pairs".format(os.path.join(output_dir, filename))
+def copy_pair_file(input_file, filename: str, output_dir: str) -> str:
+    """
+    Copy one pair file.
+    Perform renaming when necessary.
+
+    Args:
+        input_file: binary file object of the pair file (regular file or archive member)
+        filename (str): pair filename
+        output_dir (str): target directory where the pair file will be copied
+
+    Returns:
+        str: target filepath
+    """
+
+    if re.match(r"^.*\.txt\.pairs$", filename):
+        doc_id = filename.split(".")
+        target_filepath = "{}.pairs".format(os.path.join(output_dir, doc_id[0]))
+
+    else:
+        target_filepath = "{}.pairs".format(os.path.join(output_dir, filename))
 
-        shutil.copy(source_filepath, target_filepath)
+    remove_file(target_filepath)
 
+    with open(target_filepath, "wb") as output_file:
+        shutil.copyfileobj(input_file, output_file)
 
-def flatten(input_dir: str, output_dir: str) -> None:
+    copy_file_mode(input_file, target_filepath)
+
+    return target_filepath
+
+
+def get_flatten_subdir(filename: str):
+    """
+    Get the subdirectory of a flattened i2b2 directory where a file belongs
+
+    Args:
+        filename (str): filename
+
+    Returns:
+        str: chains, concepts or docs, None if the file is not part of the flattened structure
+    """
+
+    if re.match(r"^.*\.chains$", filename):
+        return "chains"
+
+    elif re.match(r"^.*\.con", filename):
+        return "concepts"
+
+    elif re.match(r"^.*\.txt", filename):
+        return "docs"
+
+    return None
+
+
+def prepare_flatten_directory(output_dir: str) -> None:
+    """
+    Prepare the directory structure of a flattened i2b2 directory
+
+    Args:
+        output_dir (str): output directory where chains, concepts and docs directories will be created
+    """
+
+    for subdir in ["chains", "concepts", "docs"]:
+        ensure_dir(os.path.join(os.path.abspath(output_dir), subdir))
+
+
+def flatten(input_dir: str, output_dir: str, link_mode: str = "copy") -> None:
     """
     Flatten an i2b2 directory structure
 
     Args:
         input_dir (str): input i2b2 directory
         output_dir (str): output directory where chains, concepts and docs files will be created
+        link_mode (str): how flattened files are created (copy, hardlink, reflink or symlink)
     """
 
     # Creating subdirectories
-    chain_dir = os.path.join(os.path.abspath(output_dir), "chains")
-    concept_dir = os.path.join(os.path.abspath(output_dir), "concepts")
-    doc_dir = os.path.join(os.path.abspath(output_dir), "docs")
-
-    ensure_dir(chain_dir)
-    ensure_dir(concept_dir)
-    ensure_dir(doc_dir)
+    prepare_flatten_directory(output_dir)
 
     for root, dirs, files in os.walk(os.path.abspath(input_dir)):
         for filename in files:
-            if re.match(r"^.*\.chains$", filename):
-                shutil.copy(os.path.join(root, filename), chain_dir)
+            subdir = get_flatten_subdir(filename)
+
+            if subdir is not None:
+                materialize_file(os.path.join(root, filename),
+                                 os.path.join(os.path.abspath(output_dir), subdir, filename),
+                                 link_mode=link_mode)
 
-            elif re.match(r"^.*\.con", filename):
-                shutil.copy(os.path.join(root, filename), concept_dir)
 
-            elif re.match(r"^.*\.txt", filename):
-                shutil.copy(os.path.join(root, filename), doc_dir)
+def get_archive_name(filename: str) -> str:
+    """
+    Get the name of the directory where an archive is decompressed
 
+    Args:
+        filename (str): archive filename (.zip or .tar.gz)
 
-def prepare_data_task1c(input_dir: str, output_dir: str, correction_file: str) -> None:
+    Returns:
+        str: archive filename without extension
+    """
+
+    if filename.endswith(".zip"):
+        return filename[:-4]
+
+    elif filename.endswith(".tar.gz"):
+        return filename[:-7]
+
+    raise ValueError("Unknown archive format: {}".format(filename))
+
+
+def iter_archive_members(archive_filepath: str):
+    """
+    Read the members of an archive one after the other, without decompressing it on disk
+
+    Args:
+        archive_filepath (str): archive filepath (.zip or .tar.gz)
+
+    Returns:
+        generator: (member path, binary file object) tuples. The file object is None for directories and must be read
+        before reading the next member
+    """
+
+    if archive_filepath.endswith(".zip"):
+        with zipfile.ZipFile(archive_filepath, "r") as zip_file:
+            for member in zip_file.infolist():
+                if member.is_dir():
+                    yield member.filename, None
+                    continue
+
+                with zip_file.open(member, "r") as input_file:
+                    yield member.filename, input_file
+
+    elif archive_filepath.endswith(".tar.gz"):
+        # Stream mode, the archive is decompressed once from start to end
+        with tarfile.open(archive_filepath, "r|gz") as tar_file:
+            for member in tar_file:
+                if member.isdir():
+                    yield member.name, None
+
+                elif member.isfile():
+                    # Members of a streamed archive are not seekable, they are read at once
+                    yield member.name, io.BytesIO(tar_file.extractfile(member).read())
+
+    else:
+        raise ValueError("Unknown archive format: {}".format(archive_filepath))
+
+
+def iter_directory_members(input_dir: str):
+    """
+    Read the files of a decompressed archive one after the other, in the same way as the members of an archive
+
+    Args:
+        input_dir (str): directory where the archive was decompressed
+
+    Returns:
+        generator: (path relative to input_dir, binary file object) tuples. The file object is None for directories
+    """
+
+    for root, dirs, files in os.walk(input_dir):
+        relative_root = os.path.relpath(root, input_dir).replace(os.sep, "/")
+        yield relative_root, None
+
+        for filename in files:
+            with open(os.path.join(root, filename), "rb") as input_file:
+                yield posixpath.join(relative_root, filename), input_file
+
+
+def get_task1c_routes(ann_corrections: dict) -> dict:
+    """
+    Get the location of each task1c source directory in the gold-standard-sorted structure
+
+    Args:
+        ann_corrections (dict): annotation corrections
+
+    Returns:
+        dict: source directory (relative to the decompressed directory) -> (copy function, target sub-path)
+    """
+
+    routes = dict()
+
+    for copy_file, all_paths in [(copy_doc_file, TASK1C_DOC_PATHS),
+                                 (partial(copy_con_file, ann_corrections=ann_corrections), TASK1C_CONCEPT_PATHS),
+                                 (partial(copy_chain_file, ann_corrections=ann_corrections), TASK1C_CHAIN_PATHS),
+                                 (copy_pair_file, TASK1C_PAIR_PATHS)]:
+        for sub_path, doc_path in all_paths.items():
+            routes[doc_path] = (copy_file, sub_path)
+
+    return routes
+
+
+def route_members(archive_name: str, all_members, routes: dict, output_dir: str, doc_ids: set = None,
+                  link_mode: str = "copy") -> tuple:
+    """
+    Route the members of an archive to their gold-standard-sorted and gold-standard-flatten locations
+
+    Args:
+        archive_name (str): name of the directory where the archive is decompressed
+        all_members (iterable): (member path, binary file object) tuples, the file object is None for directories
+        routes (dict): source directory (relative to the decompressed directory) -> (copy function, target sub-path)
+        output_dir (str): working directory where files are sorted
+        doc_ids (set): IDs of the documents to route, all documents are routed if None
+        link_mode (str): how gold-standard-flatten files are created (copy, hardlink, reflink or symlink)
+
+    Returns:
+        (set, dict): directories found in the archive (relative to the decompressed directory) and hash of the files
+        written (paths relative to output_dir)
+    """
+
+    destination_directory = os.path.join(output_dir, "gold-standard-sorted")
+    flatten_directory = os.path.join(output_dir, "gold-standard-flatten")
+
+    found_dirs = set()
+    all_hashes = dict()
+
+    for member_name, input_file in all_members:
+        member_path = posixpath.normpath(posixpath.join(archive_name, member_name))
+
+        if input_file is None:
+            found_dirs.add(member_path)
+            continue
+
+        source_dir, member_filename = posixpath.split(member_path)
+        found_dirs.add(source_dir)
+
+        if source_dir not in routes:
+            continue
+
+        if doc_ids is not None and member_filename.split(".")[0] not in doc_ids:
+            continue
+
+        copy_file, sub_path = routes[source_dir]
+        target_filepath = copy_file(input_file, member_filename, os.path.join(destination_directory, sub_path))
+
+        file_hash = get_file_hash(target_filepath)
+        all_hashes[os.path.relpath(target_filepath, output_dir)] = file_hash
+
+        # Flattening structures
+        subdir = get_flatten_subdir(os.path.basename(target_filepath))
+        if subdir is not None:
+            part = sub_path.split("/")[1]
+            flatten_filepath = materialize_file(
+                target_filepath,
+                os.path.join(flatten_directory, "task1c", part, subdir, os.path.basename(target_filepath)),
+                link_mode=link_mode
+            )
+            all_hashes[os.path.relpath(flatten_filepath, output_dir)] = file_hash
+
+    return found_dirs, all_hashes
+
+
+def process_archive(archive_filepath: str, doc_ids: set, routes: dict, output_dir: str, streaming: bool,
+                    link_mode: str = "copy") -> tuple:
+    """
+    Decompress an archive and route its members to their gold-standard-sorted and gold-standard-flatten locations.
+    In streaming mode, members are read directly from the archive.
+
+    Args:
+        archive_filepath (str): archive filepath (.zip or .tar.gz)
+        doc_ids (set): IDs of the documents to route, all documents are routed if None. If the archive was already
+            decompressed, documents are read from the decompressed directory
+        routes (dict): source directory (relative to the decompressed directory) -> (copy function, target sub-path)
+        output_dir (str): working directory where files are decompressed and sorted
+        streaming (bool): read members directly from the archive
+        link_mode (str): how gold-standard-flatten files are created (copy, hardlink, reflink or symlink)
+
+    Returns:
+        (set, dict, float): directories found in the archive (relative to the decompressed directory), hash of the
+        files written (paths relative to output_dir) and processing time (s)
+    """
+
+    start = time.perf_counter()
+    archive_name = get_archive_name(os.path.basename(archive_filepath))
+
+    if streaming:
+        all_members = iter_archive_members(archive_filepath)
+    else:
+        target_path = os.path.join(output_dir, "decompressed", archive_name)
+
+        if doc_ids is None or not os.path.isdir(target_path):
+            decompress_archive(archive_filepath, target_path)
+
+        all_members = iter_directory_members(target_path)
+
+    found_dirs, all_hashes = route_members(archive_name, all_members, routes, output_dir, doc_ids=doc_ids,
+                                           link_mode=link_mode)
+
+    return found_dirs, all_hashes, time.perf_counter() - start
+
+
+def decompress_archive(archive_filepath: str, target_path: str) -> None:
+    """
+    Decompress an archive, the content of a previous decompression is removed
+
+    Args:
+        archive_filepath (str): archive filepath (.zip or .tar.gz)
+        target_path (str): directory where the archive is decompressed
+    """
+
+    if os.path.isdir(target_path):
+        shutil.rmtree(target_path)
+
+    if archive_filepath.endswith(".zip"):
+        zip_file = zipfile.ZipFile(archive_filepath, 'r')
+        zip_file.extractall(target_path)
+        zip_file.close()
+
+    elif archive_filepath.endswith(".tar.gz"):
+        tar_file = tarfile.open(archive_filepath, "r:gz")
+        tar_file.extractall(target_path)
+        tar_file.close()
+
+    else:
+        raise ValueError("Unknown archive format: {}".format(archive_filepath))
+
+
+def get_prepare_manifest_path(output_dir: str) -> str:
+    """
+    Get the path of the PREPARE-DATA manifest
+
+    Args:
+        output_dir (str): working directory where files are decompressed and sorted
+
+    Returns:
+        str: manifest filepath
+    """
+
+    return os.path.join(os.path.abspath(output_dir), PREPARE_MANIFEST_FILENAME)
+
+
+def get_correction_hashes(ann_corrections: dict) -> dict:
+    """
+    Compute the hash of the corrections of each document
+
+    Args:
+        ann_corrections (dict): annotation corrections
+
+    Returns:
+        dict: document ID -> hexadecimal digest
+    """
+
+    return {
+        doc_id: hashlib.sha256(json.dumps(doc_corrections, sort_keys=True).encode("UTF-8")).hexdigest()
+        for doc_id, doc_corrections in ann_corrections.items()
+    }
+
+
+def get_outdated_documents(manifest: dict, output_dir: str, correction_hashes: dict, changed_archives: set) -> set:
+    """
+    Find the documents of unchanged archives which must be processed again: their corrections have changed or one
+    of their files has been modified or removed
+
+    Args:
+        manifest (dict): manifest of the previous run
+        output_dir (str): working directory where files are decompressed and sorted
+        correction_hashes (dict): hash of the corrections of each document
+        changed_archives (set): archives which are processed entirely
+
+    Returns:
+        set: document IDs
+    """
+
+    doc_ids = {
+        doc_id for doc_id in set(correction_hashes) | set(manifest["corrections"])
+        if correction_hashes.get(doc_id) != manifest["corrections"].get(doc_id)
+    }
+
+    for relative_path, (file_hash, filename) in manifest["files"].items():
+        if filename in changed_archives:
+            continue
+
+        filepath = os.path.join(output_dir, relative_path)
+        if not os.path.isfile(filepath) or get_file_hash(filepath) != file_hash:
+            doc_ids.add(os.path.basename(relative_path).split(".")[0])
+
+    return doc_ids
+
+
+def prepare_data_task1c(input_dir: str, output_dir: str, correction_file: str, streaming: bool = False,
+                        workers: int = 1, incremental: bool = False, link_mode: str = "copy") -> None:
     """
     Prepare task1c documents (decompress, rename, correct and sort).
     The function creates two subdirectories within output_dir:
-    * decompressed: zip files are decompressed into this directory
+    * decompressed: zip files are decompressed into this directory (not created in streaming mode)
     * gold-standard-sorted/task1c: chain, text and concept files are sorted, renamed, corrected and put in
     this directory according to the corpus part they belong to
     * gold-standard-flatten/task1c: all chain, text and concept files are regrouped together to facilitate evaluation
 
+    The corpus manifest maps each document to its split, its source and the paths and sizes of its files, so that
+    the next stages do not need to walk directories.
+
+    A manifest records the hash of the archives, of the corrections of each document and of each produced file. In
+    incremental mode, only changed archives are processed again, as well as the documents of unchanged archives whose
+    corrections or produced files have changed.
+
     Args:
         input_dir: directory where zip files are stored
         output_dir: working directory where files will decompressed and sorted
         correction_file: annotation correction JSON file path
+        streaming: read files directly from the archives instead of decompressing them first
+        workers: number of worker processes, archives are decompressed and routed in parallel
+        incremental: only process the archives and documents which have changed since the last run
+        link_mode: how gold-standard-flatten files are created from gold-standard-sorted files (copy, hardlink,
+            reflink or symlink)
     """
 
-    # Directory where zip will be decompressed
-    target_uncompressed_path = os.path.join(os.path.abspath(output_dir), "decompressed")
-    ensure_dir(target_uncompressed_path)
-
     # Verifying that compressed files exist
     for filename in TASK1C_COMPRESSED_FILES:
         if not os.path.isfile(os.path.join(input_dir, filename)):
             raise FileNotFoundError("One file is missing: {}".format(filename))
 
-    # Decompressing compressed files
-    for filename in TASK1C_COMPRESSED_FILES:
-        if filename.endswith(".zip"):
-            source_file_path = os.path.join(input_dir, filename)
-            target_path = os.path.join(target_uncompressed_path, filename[:-4])
-
-            zip_file = zipfile.ZipFile(source_file_path, 'r')
-            zip_file.extractall(target_path)
-            zip_file.close()
-
-        elif filename.endswith(".tar.gz"):
-            source_file_path = os.path.join(input_dir, filename)
-            target_path = os.path.join(target_uncompressed_path, filename[:-7])
-
-            tar_file = tarfile.open(source_file_path, "r:gz")
-            tar_file.extractall(target_path)
-            tar_file.close()
-
     # Preparing directory structure in the target directory
     destination_directory = os.path.join(output_dir, "gold-standard-sorted")
     prepare_destination_directory_task1c(destination_directory)
 
+    for part in ["train", "test"]:
+        prepare_flatten_directory(os.path.join(output_dir, "gold-standard-flatten", "task1c", part))
+
     # Loading annotation corrections
     with open(os.path.abspath(correction_file), "r", encoding="UTF-8") as input_file:
         ann_corrections = json.load(input_file)
 
-    # Copying text files
-    for sub_path, doc_path in TASK1C_DOC_PATHS.items():
-        source_path = os.path.join(target_uncompressed_path, doc_path)
-        target_path = os.path.join(destination_directory, sub_path)
-
-        copy_doc_files(source_path, target_path)
-
-    # Copying concept files
-    for sub_path, doc_path in TASK1C_CONCEPT_PATHS.items():
-        source_path = os.path.join(target_uncompressed_path, doc_path)
-        target_path = os.path.join(destination_directory, sub_path)
-
-        copy_con_files(source_path, target_path, ann_corrections)
-
-    # Copying chain files
-    for sub_path, doc_path in TASK1C_CHAIN_PATHS.items():
-        source_path = os.path.join(target_uncompressed_path, doc_path)
-        target_path = os.path.join(destination_directory, sub_path)
-
-        copy_chain_files(source_path, target_path, ann_corrections)
-
-    # Copying pair files
-    for sub_path, doc_path in TASK1C_PAIR_PATHS.items():
-        source_path = os.path.join(target_uncompressed_path, doc_path)
-        target_path = os.path.join(destination_directory, sub_path)
-
-        copy_pair_files(source_path, target_path)
-
-    # Flattening structures
-    input_train_dir = os.path.join(destination_directory, "task1c", "train")
-    output_flatten_train_dir = os.path.join(output_dir, "gold-standard-flatten", "task1c", "train")
-
-    input_test_dir = os.path.join(destination_directory, "task1c", "test")
-    output_flatten_test_dir = os.path.join(output_dir, "gold-standard-flatten", "task1c", "test")
-
-    flatten(input_train_dir, output_flatten_train_dir)
-    flatten(input_test_dir, output_flatten_test_dir)
+    # Loading the manifest of the previous run
+    manifest = None
+    manifest_filepath = get_prepare_manifest_path(output_dir)
+
+    if incremental and os.path.isfile(manifest_filepath):
+        with open(manifest_filepath, "r", encoding="UTF-8") as input_file:
+            manifest = json.load(input_file)
+
+        if manifest.get("version") != PREPARE_MANIFEST_VERSION or manifest.get("streaming") != streaming or \
+                manifest.get("link_mode", "copy") != link_mode:
+            manifest = None
+
+    archive_hashes = {
+        filename: get_file_hash(os.path.join(input_dir, filename)) for filename in TASK1C_COMPRESSED_FILES
+    }
+    correction_hashes = get_correction_hashes(ann_corrections)
+
+    if manifest is None:
+        changed_archives = set(TASK1C_COMPRESSED_FILES)
+        outdated_doc_ids = set()
+        all_files = dict()
+    else:
+        changed_archives = {
+            filename for filename in TASK1C_COMPRESSED_FILES
+            if manifest["archives"].get(filename) != archive_hashes[filename]
+        }
+        outdated_doc_ids = get_outdated_documents(manifest, output_dir, correction_hashes, changed_archives)
+
+        # Files of changed archives are removed, documents may have been removed from the archives
+        all_files = dict()
+        for relative_path, (file_hash, filename) in manifest["files"].items():
+            if filename not in changed_archives:
+                all_files[relative_path] = [file_hash, filename]
+
+            elif os.path.isfile(os.path.join(output_dir, relative_path)):
+                os.remove(os.path.join(output_dir, relative_path))
+
+    # Archives to process and documents to route within each archive (None: all documents)
+    all_tasks = list()
+    for filename in TASK1C_COMPRESSED_FILES:
+        if filename in changed_archives:
+            all_tasks.append((filename, None))
+        elif len(outdated_doc_ids) > 0:
+            all_tasks.append((filename, outdated_doc_ids))
+        else:
+            logging.info("Skipping {} (unchanged)".format(filename))
+
+    routes = get_task1c_routes(ann_corrections)
+    all_results = map_workers(
+        partial(process_archive, routes=routes, output_dir=output_dir, streaming=streaming, link_mode=link_mode),
+        [os.path.join(input_dir, filename) for filename, _ in all_tasks],
+        [doc_ids for _, doc_ids in all_tasks],
+        workers=workers
+    )
+
+    for (filename, doc_ids), (found_dirs, all_hashes, elapsed) in zip(all_tasks, all_results):
+        logging.info("Processed {} ({} files written) in {:.2f}s".format(filename, len(all_hashes), elapsed))
+
+        archive_name = get_archive_name(filename)
+        for doc_path in routes:
+            if doc_path.split("/")[0] == archive_name and doc_path not in found_dirs:
+                raise FileNotFoundError("One directory is missing from the archives: {}".format(doc_path))
+
+        for relative_path, file_hash in all_hashes.items():
+            all_files[relative_path] = [file_hash, filename]
+
+    # Writing the manifest
+    with open(manifest_filepath, "w", encoding="UTF-8") as output_file:
+        json.dump({
+            "version": PREPARE_MANIFEST_VERSION,
+            "streaming": streaming,
+            "link_mode": link_mode,
+            "archives": archive_hashes,
+            "corrections": correction_hashes,
+            "files": all_files
+        }, output_file, indent=2, sort_keys=True)
+
+    # Writing the corpus manifest used by the next stages to find documents
+    write_corpus_manifest(build_corpus_manifest(all_files, output_dir), output_dir)
 
 
 def prepare_destination_directory_task1c(destination_directory: os.path) -> None:
@@ -190,70 +190,136 @@ def get_last_ids(file_path: str) -> tuple:
 
 def parse_ann_file(ann_filename: str) -> tuple:
     """
-    Parse a brat .ann file and return a dictionary of entities and a list of relations.
+    Parse a brat .ann file and return a dictionary of entities and a dictionary of relations.
+    The file is read once, each line is matched against the pattern selected by its first character.
 
     Args:
         ann_filename (str): brat annotation filepath
 
     Returns:
-        (dict, list): document entities and document relations
+        (dict, dict): document entities and document relations, indexed by brat ID
     """
 
-    regex_entity = re.compile("^T(\d+)\t([^\s]+)\s([^\t]+)\t([^\t]*)$")
-    regex_attribute = re.compile("^A(\d+)\t([^\s]+)\sT(\d+)\s(.*)$")
-    regex_relation = re.compile("^R(\d+)\t([^\s]+)\sArg1:T(\d+)\sArg2:T(\d+)$")
+    regex_entity = re.compile(r"^T(\d+)\t([^\s]+)\s([^\t]+)\t([^\t]*)$")
+    regex_attribute = re.compile(r"^A(\d+)\t([^\s]+)\sT(\d+)\s(.*)$")
+    regex_relation = re.compile(r"^R(\d+)\t([^\s]+)\sArg1:T(\d+)\sArg2:T(\d+)$")
 
     entities = dict()
     relations = dict()
 
-    # Extraction entity annotations (without attributes)
+    # Attributes may refer to entities defined further in the file
+    attributes = list()
+
     with open(ann_filename, "r", encoding="UTF-8") as input_file:
         for line in input_file:
-            match_entity = regex_entity.match(line)
-            if match_entity:
+            first_char = line[:1]
+
+            if first_char == "T":
+                match_entity = regex_entity.match(line)
+                if match_entity:
+                    brat_id = int(match_entity.group(1))
+
+                    spans = list()
+                    for span in match_entity.group(3).split(";"):
+                        begin, end = span.split()[:2]
+                        spans.append((int(begin), int(end)))
+
+                    entities[brat_id] = Entity(brat_id, spans, match_entity.group(2),
+                                               match_entity.group(4).rstrip("\n"))
+
+            elif first_char == "A":
+                match_attribute = regex_attribute.match(line)
+                if match_attribute:
+                    attributes.append((int(match_attribute.group(3)), match_attribute.group(2),
+                                       match_attribute.group(4)))
+
+            elif first_char == "R":
+                match_relation = regex_relation.match(line)
+                if match_relation:
+                    relations[int(match_relation.group(1))] = Relation(
+                        match_relation.group(2),
+                        int(match_relation.group(3)),
+                        int(match_relation.group(4))
+                    )
+
+    for brat_id, attribute_name, attribute_value in attributes:
+        if brat_id in entities:
+            entities[brat_id].attributes[attribute_name] = attribute_value
 
-                brat_id = int(match_entity.group(1))
+    return entities, relations
 
-                current_entity = {
-                    "id": brat_id,
-                    "brat_id": brat_id,
-                    "spans": list(),
-                    "is_split": False,
-                    "type": match_entity.group(2),
-                    "text": match_entity.group(4).rstrip("\n"),
-                    "attributes": dict()
-                }
 
-                spans = match_entity.group(3).split(";")
-                for span in spans:
-                    begin = int(span.split()[0])
-                    end = int(span.split()[1])
+class Record:
+    """
+    Base class of brat annotations. Fields are stored in slots and can also be accessed like dictionary keys.
+    """
 
-                    current_entity["spans"].append((begin, end))
+    __slots__ = ()
 
-                if len(current_entity["spans"]) == 1:
-                    current_entity["is_split"] = True
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
 
-                entities[brat_id] = current_entity
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.__slots__:
+            raise KeyError(key)
 
-    # Extracting entity attributes
-    with open(ann_filename, "r", encoding="UTF-8") as input_file:
-        for line in input_file:
-            match_attribute = regex_attribute.match(line)
-            if match_attribute:
-                if int(match_attribute.group(3)) in entities:
-                    entities[int(match_attribute.group(3))][
-                        'attributes'][match_attribute.group(2)] = match_attribute.group(4)
+        setattr(self, key, value)
 
-    # Extracting relations
-    with open(ann_filename, "r", encoding="UTF-8") as input_file:
-        for line in input_file:
-            match_relation = regex_relation.match(line)
-            if match_relation:
-                relations[int(match_relation.group(1))] = {
-                    "type": match_relation.group(2),
-                    "arg1": int(match_relation.group(3)),
-                    "arg2": int(match_relation.group(4))
-                }
+    def __contains__(self, key) -> bool:
+        return key in self.__slots__
 
-    return entities, relations
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+
+        return all(self[key] == other[key] for key in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(key, self[key]) for key in self.__slots__
+        ))
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self) -> tuple:
+        return self.__slots__
+
+    def items(self) -> list:
+        return [(key, self[key]) for key in self.__slots__]
+
+
+class Entity(Record):
+    """
+    brat entity (T line)
+    """
+
+    __slots__ = ("id", "brat_id", "spans", "is_split", "type", "text", "attributes")
+
+    def __init__(self, brat_id: int, spans: list, entity_type: str, text: str):
+
+        self.id = brat_id
+        self.brat_id = brat_id
+        self.spans = spans
+        # Kept for compatibility with previous versions: flag set when the entity has a single span
+        self.is_split = len(spans) == 1
+        self.type = entity_type
+        self.text = text
+        self.attributes = dict()
+
+
+class Relation(Record):
+    """
+    brat relation (R line)
+    """
+
+    __slots__ = ("type", "arg1", "arg2")
+
+    def __init__(self, relation_type: str, arg1: int, arg2: int):
+
+        self.type = relation_type
+        self.arg1 = arg1
+        self.arg2 = arg2
@@ -0,0 +1,79 @@
+def find_root(parents: list, idx: int) -> int:
+    """
+    Find the root of an element in a union-find forest, compressing the path on the way
+
+    Args:
+        parents (list): parent index of each element
+        idx (int): element index
+
+    Returns:
+        int: root index
+    """
+
+    root = idx
+    while parents[root] != root:
+        root = parents[root]
+
+    while parents[idx] != root:
+        parents[idx], idx = root, parents[idx]
+
+    return root
+
+
+def extract_chains(entities: dict, relations: dict) -> list:
+    """
+    Given the entities and relations extracted from a brat document, return the coreference chains.
+    Entities linked by relations are grouped with a union-find (path compression, union by rank), entities which do
+    not appear in any relation are returned as single-mention chains.
+
+    Args:
+        entities (dict): entities extracted from a brat document
+        relations (dict): relations extracted from a brat document
+
+    Returns:
+        list: coreference chains (lists of sorted entity IDs). Chains are ordered by the first appearance of one of
+        their entities in the relations, followed by singletons sorted by entity ID
+    """
+
+    # Dense index of entity IDs in order of appearance in the relations
+    positions = dict()
+    pairs = list()
+
+    for relation in relations.values():
+        idx_1 = positions.setdefault(relation.arg1, len(positions))
+        idx_2 = positions.setdefault(relation.arg2, len(positions))
+        pairs.append((idx_1, idx_2))
+
+    parents = list(range(len(positions)))
+    ranks = [0] * len(positions)
+
+    for root_1, root_2 in pairs:
+        if parents[root_1] != root_1:
+            root_1 = find_root(parents, root_1)
+
+        if parents[root_2] != root_2:
+            root_2 = find_root(parents, root_2)
+
+        if root_1 == root_2:
+            continue
+
+        if ranks[root_1] < ranks[root_2]:
+            root_1, root_2 = root_2, root_1
+
+        parents[root_2] = root_1
+
+        if ranks[root_1] == ranks[root_2]:
+            ranks[root_1] += 1
+
+    chains = dict()
+
+    for brat_id, idx in positions.items():
+        if parents[idx] != idx:
+            idx = find_root(parents, idx)
+
+        chains.setdefault(idx, list()).append(brat_id)
+
+    all_chains = [sorted(chain) for chain in chains.values()]
+    all_chains.extend([brat_id] for brat_id in sorted(entities) if brat_id not in positions)
+
+    return all_chains
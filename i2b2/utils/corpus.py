@@ -0,0 +1,173 @@
+import json
+import os
+
+# Corpus manifest, written in the PREPARE-DATA working directory. Each document ID is mapped to its split (train or
+# test), its source (BETH or PARTNERS) and its artifacts: "stage/kind" -> [path relative to the working directory,
+# size in bytes], e.g. "sorted/docs", "flatten/concepts" or "brat/ann"
+CORPUS_MANIFEST_FILENAME = "corpus-manifest.json"
+CORPUS_MANIFEST_VERSION = 1
+
+
+def get_corpus_manifest_path(data_dir: str) -> str:
+    """
+    Get the path of the corpus manifest
+
+    Args:
+        data_dir (str): PREPARE-DATA working directory
+
+    Returns:
+        str: manifest filepath
+    """
+
+    return os.path.join(os.path.abspath(data_dir), CORPUS_MANIFEST_FILENAME)
+
+
+def load_corpus_manifest(data_dir: str):
+    """
+    Load the corpus manifest of a working directory
+
+    Args:
+        data_dir (str): PREPARE-DATA working directory
+
+    Returns:
+        dict: document ID -> document entry, None if there is no manifest (directories must be walked instead)
+    """
+
+    manifest_filepath = get_corpus_manifest_path(data_dir)
+
+    if not os.path.isfile(manifest_filepath):
+        return None
+
+    with open(manifest_filepath, "r", encoding="UTF-8") as input_file:
+        manifest = json.load(input_file)
+
+    if manifest.get("version") != CORPUS_MANIFEST_VERSION:
+        return None
+
+    return manifest["documents"]
+
+
+def write_corpus_manifest(documents: dict, data_dir: str) -> None:
+    """
+    Write the corpus manifest of a working directory
+
+    Args:
+        documents (dict): document ID -> document entry
+        data_dir (str): PREPARE-DATA working directory
+    """
+
+    with open(get_corpus_manifest_path(data_dir), "w", encoding="UTF-8") as output_file:
+        json.dump({"version": CORPUS_MANIFEST_VERSION, "documents": documents}, output_file, indent=2,
+                  sort_keys=True)
+
+
+def build_corpus_manifest(relative_paths, data_dir: str) -> dict:
+    """
+    Build the corpus manifest from the files produced by PREPARE-DATA
+
+    Args:
+        relative_paths (iterable): paths of the gold-standard-sorted and gold-standard-flatten files, relative to the
+            working directory
+        data_dir (str): PREPARE-DATA working directory
+
+    Returns:
+        dict: document ID -> document entry
+    """
+
+    documents = dict()
+    flatten_paths = list()
+
+    for relative_path in sorted(relative_paths):
+        parts = relative_path.split(os.sep)
+
+        # gold-standard-sorted/task1c/SPLIT/SOURCE/KIND/FILENAME
+        if parts[0] == "gold-standard-sorted" and len(parts) == 6:
+            document = documents.setdefault(parts[-1].split(".")[0], {
+                "split": parts[2],
+                "source": parts[3],
+                "artifacts": dict()
+            })
+            add_artifact(document, "sorted/{}".format(parts[4]), relative_path, data_dir)
+
+        # gold-standard-flatten/task1c/SPLIT/KIND/FILENAME
+        elif parts[0] == "gold-standard-flatten" and len(parts) == 5:
+            flatten_paths.append((parts[-1].split(".")[0], parts[3], relative_path))
+
+    for doc_id, kind, relative_path in flatten_paths:
+        if doc_id in documents:
+            add_artifact(documents[doc_id], "flatten/{}".format(kind), relative_path, data_dir)
+
+    return documents
+
+
+def add_artifact(document: dict, artifact: str, relative_path: str, data_dir: str) -> None:
+    """
+    Record an artifact of a document, with its size
+
+    Args:
+        document (dict): document entry
+        artifact (str): artifact name (stage/kind)
+        relative_path (str): artifact path, relative to the working directory
+        data_dir (str): PREPARE-DATA working directory
+    """
+
+    document["artifacts"][artifact] = [relative_path, os.path.getsize(os.path.join(data_dir, relative_path))]
+
+
+def get_artifact_paths(documents: dict, artifacts: list, data_dir: str, split: str = None) -> list:
+    """
+    Get the paths of some artifacts of every document
+
+    Args:
+        documents (dict): document ID -> document entry
+        artifacts (list): artifact names (stage/kind)
+        data_dir (str): PREPARE-DATA working directory
+        split (str): only return the documents of this split (train or test)
+
+    Returns:
+        list: (document ID, document entry, absolute artifact paths) tuples sorted by document ID, None if one of the
+        documents does not have all the artifacts or if one of the artifact files does not exist anymore (outdated
+        manifest)
+    """
+
+    all_paths = list()
+
+    for doc_id, document in sorted(documents.items()):
+        if split is not None and document["split"] != split:
+            continue
+
+        if any(artifact not in document["artifacts"] for artifact in artifacts):
+            return None
+
+        paths = [os.path.join(os.path.abspath(data_dir), document["artifacts"][artifact][0]) for artifact in artifacts]
+        if not all(map(os.path.isfile, paths)):
+            return None
+
+        all_paths.append((doc_id, document, paths))
+
+    return all_paths
+
+
+def get_corpus_filepaths(data_dir: str, artifacts: list) -> list:
+    """
+    Look up some artifacts of every document in the corpus manifest of a working directory
+
+    Args:
+        data_dir (str): PREPARE-DATA working directory
+        artifacts (list): artifact names (stage/kind)
+
+    Returns:
+        list: absolute artifact paths of each document (one tuple per document, sorted by document ID), None if there
+        is no manifest, if one of the documents does not have all the artifacts or if one of the artifact files does
+        not exist anymore
+    """
+
+    documents = load_corpus_manifest(data_dir)
+    if documents is None:
+        return None
+
+    all_paths = get_artifact_paths(documents, artifacts, data_dir)
+    if all_paths is None:
+        return None
+
+    return [tuple(paths) for _, _, paths in all_paths]
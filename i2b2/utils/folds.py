@@ -0,0 +1,130 @@
+import hashlib
+import math
+
+SPLIT_TYPES = ("holdout", "kfold")
+
+# Default train/dev split of the training documents (train.conll and dev.conll)
+DEFAULT_SPLIT_CONFIG = ("", "holdout", 0.2)
+DEFAULT_SEED = 42
+
+
+def parse_split_config(spec: str) -> tuple:
+    """
+    Parse a named split configuration: NAME=holdout:DEV_SIZE or NAME=kfold:NB_FOLDS
+
+    Args:
+        spec (str): split configuration
+
+    Returns:
+        (str, str, float|int): configuration name, split type and dev size or number of folds
+    """
+
+    name, sep, split = spec.partition("=")
+    split_type, _, value = split.partition(":")
+
+    if sep == "" or name == "" or split_type not in SPLIT_TYPES:
+        raise ValueError("Invalid split configuration (NAME=holdout:DEV_SIZE or NAME=kfold:NB_FOLDS): {}".format(
+            spec
+        ))
+
+    if split_type == "holdout":
+        dev_size = float(value)
+        if not 0.0 < dev_size < 1.0:
+            raise ValueError("The dev size must be between 0 and 1: {}".format(spec))
+
+        return name, split_type, dev_size
+
+    nb_folds = int(value)
+    if nb_folds < 2:
+        raise ValueError("The number of folds must be at least 2: {}".format(spec))
+
+    return name, split_type, nb_folds
+
+
+def parse_split_configs(all_specs: list) -> list:
+    """
+    Parse several named split configurations, split names must be unique
+
+    Args:
+        all_specs (list): split configurations (NAME=holdout:DEV_SIZE or NAME=kfold:NB_FOLDS)
+
+    Returns:
+        list: (configuration name, split type, dev size or number of folds) tuples
+    """
+
+    split_configs = [parse_split_config(spec) for spec in all_specs]
+    check_split_names(split_configs)
+
+    return split_configs
+
+
+def check_split_names(split_configs: list) -> None:
+    """
+    Make sure that split configurations have unique names, documents of two configurations with the same name would
+    be written twice to the same aggregated files
+
+    Args:
+        split_configs (list): (configuration name, split type, dev size or number of folds) tuples
+    """
+
+    all_names = set()
+
+    for name, _, _ in split_configs:
+        if name in all_names:
+            raise ValueError("Duplicate split configuration name: {}".format(name))
+
+        all_names.add(name)
+
+
+def get_document_order(document_ids: list, seed: int = DEFAULT_SEED) -> list:
+    """
+    Shuffle documents deterministically: documents are sorted by a hash of their ID and of the seed, which does not
+    depend on the order in which they were found on disk
+
+    Args:
+        document_ids (list): document IDs
+        seed (int): seed mixed with document IDs
+
+    Returns:
+        list: document indexes in shuffled order
+    """
+
+    keys = [
+        (hashlib.sha1("{}:{}".format(seed, document_id).encode("UTF-8")).digest(), document_id)
+        for document_id in document_ids
+    ]
+
+    return sorted(range(len(document_ids)), key=keys.__getitem__)
+
+
+def get_dev_folds(document_ids: list, split_type: str, value, seed: int = DEFAULT_SEED) -> list:
+    """
+    Assign documents to the dev part of one or several folds
+
+    Args:
+        document_ids (list): document IDs
+        split_type (str): holdout (one fold, value is the dev size) or kfold (value is the number of folds)
+        value (float|int): dev size or number of folds
+        seed (int): seed mixed with document IDs
+
+    Returns:
+        list: (fold name, dev flag of each document) tuples. The fold name is empty for holdout splits
+    """
+
+    order = get_document_order(document_ids, seed=seed)
+
+    if split_type == "holdout":
+        is_dev = [False] * len(document_ids)
+        for idx in order[:math.ceil(value * len(document_ids))]:
+            is_dev[idx] = True
+
+        return [("", is_dev)]
+
+    if split_type == "kfold":
+        folds = [0] * len(document_ids)
+        for rank, idx in enumerate(order):
+            folds[idx] = rank % value
+
+        return [("fold-{}".format(fold + 1), [doc_fold == fold for doc_fold in folds]) for fold in range(value)]
+
+    raise ValueError("Unknown split type: {}".format(split_type))
@@ -0,0 +1,233 @@
+import json
+import mmap
+import struct
+from collections.abc import Mapping
+
+# Binary character mapping layout:
+# * magic
+# * document blocks, one run per line of consecutive replaced characters: begin offset, source and target lengths
+#   (UTF-8 bytes) followed by the source and target strings
+# * index: number of documents, then filename, block offset and number of runs for each document
+# * footer: index offset
+MAPPING_MAGIC = b"I2B2MAP1"
+
+RUN_STRUCT = struct.Struct("<III")
+INDEX_ENTRY_STRUCT = struct.Struct("<QI")
+LENGTH_STRUCT = struct.Struct("<I")
+FOOTER_STRUCT = struct.Struct("<Q")
+
+
+def get_runs(doc_mapping: dict) -> list:
+    """
+    Convert a JSON character mapping (character offset -> (source character, target character)) to runs of
+    consecutive replaced characters
+
+    Args:
+        doc_mapping (dict): JSON character mapping of one document
+
+    Returns:
+        list: (begin offset, source string, target string) tuples sorted by offset
+    """
+
+    runs = list()
+
+    for idx, (source, target) in sorted(doc_mapping.items(), key=lambda x: int(x[0])):
+        if len(target) != len(source):
+            raise ValueError("Source and target lengths differ at offset {}: {} {}".format(idx, source, target))
+
+        if len(runs) > 0 and runs[-1][0] + len(runs[-1][1]) == int(idx):
+            begin, run_source, run_target = runs[-1]
+            runs[-1] = (begin, run_source + source, run_target + target)
+        else:
+            runs.append((int(idx), source, target))
+
+    return runs
+
+
+def apply_char_mapping(content: str, runs: list) -> str:
+    """
+    Replace characters of a document in a single pass
+
+    Args:
+        content (str): document content
+        runs (list): (begin offset, source string, target string) tuples sorted by offset
+
+    Returns:
+        str: modified content
+    """
+
+    chunks = list()
+    previous_end = 0
+
+    for begin, source, target in runs:
+        chunks.append(content[previous_end:begin])
+        chunks.append(target)
+        previous_end = begin + len(target)
+
+    chunks.append(content[previous_end:])
+
+    return "".join(chunks)
+
+
+def write_char_mapping(all_runs, target_filepath: str) -> None:
+    """
+    Write a binary character mapping file. Documents are written as they come and the index is appended at the end.
+
+    Args:
+        all_runs (iterable): (filename, runs) tuples
+        target_filepath (str): binary mapping filepath
+    """
+
+    index = list()
+
+    with open(target_filepath, "wb") as output_file:
+        output_file.write(MAPPING_MAGIC)
+
+        for filename, runs in all_runs:
+            index.append((filename, output_file.tell(), len(runs)))
+
+            for begin, source, target in runs:
+                source_bytes = source.encode("UTF-8")
+                target_bytes = target.encode("UTF-8")
+
+                output_file.write(RUN_STRUCT.pack(begin, len(source_bytes), len(target_bytes)))
+                output_file.write(source_bytes)
+                output_file.write(target_bytes)
+
+        index_offset = output_file.tell()
+        output_file.write(LENGTH_STRUCT.pack(len(index)))
+
+        for filename, offset, nb_runs in index:
+            filename_bytes = filename.encode("UTF-8")
+
+            output_file.write(LENGTH_STRUCT.pack(len(filename_bytes)))
+            output_file.write(filename_bytes)
+            output_file.write(INDEX_ENTRY_STRUCT.pack(offset, nb_runs))
+
+        output_file.write(FOOTER_STRUCT.pack(index_offset))
+
+
+def convert_char_mapping(json_filepath: str, target_filepath: str) -> None:
+    """
+    Convert a JSON character mapping file to the binary format
+
+    Args:
+        json_filepath (str): JSON mapping filepath
+        target_filepath (str): binary mapping filepath
+    """
+
+    with open(json_filepath, "r", encoding="UTF-8") as input_file:
+        char_mapping = json.load(input_file)
+
+    write_char_mapping(((filename, get_runs(doc_mapping)) for filename, doc_mapping in char_mapping.items()),
+                       target_filepath)
+
+
+def load_char_mapping(mapping_filepath: str) -> "CharMapping":
+    """
+    Open a character mapping file (binary or JSON format)
+
+    Args:
+        mapping_filepath (str): mapping filepath
+
+    Returns:
+        CharMapping: character mapping
+    """
+
+    return CharMapping(mapping_filepath)
+
+
+class CharMapping(Mapping):
+    """
+    Character mapping, behaves like a dict mapping filenames to runs of replaced characters.
+    Binary files are memory-mapped and only the index is read when the file is opened, document runs are decoded on
+    access. JSON files are loaded entirely.
+    """
+
+    def __init__(self, mapping_filepath: str):
+
+        self.mapping_filepath = mapping_filepath
+
+        self._file = open(mapping_filepath, "rb")
+        self._json = None
+        self._mmap = None
+        self._index = dict()
+
+        if self._file.read(len(MAPPING_MAGIC)) == MAPPING_MAGIC:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._load_index()
+        else:
+            self._file.seek(0)
+            self._json = json.loads(self._file.read().decode("UTF-8"))
+            self._file.close()
+
+    def _load_index(self) -> None:
+        """
+        Read the document index of a binary mapping file
+        """
+
+        position, = FOOTER_STRUCT.unpack_from(self._mmap, len(self._mmap) - FOOTER_STRUCT.size)
+
+        nb_documents, = LENGTH_STRUCT.unpack_from(self._mmap, position)
+        position += LENGTH_STRUCT.size
+
+        for _ in range(nb_documents):
+            filename_length, = LENGTH_STRUCT.unpack_from(self._mmap, position)
+            position += LENGTH_STRUCT.size
+
+            filename = self._mmap[position:position + filename_length].decode("UTF-8")
+            position += filename_length
+
+            self._index[filename] = INDEX_ENTRY_STRUCT.unpack_from(self._mmap, position)
+            position += INDEX_ENTRY_STRUCT.size
+
+    def __getitem__(self, filename: str) -> list:
+        if self._json is not None:
+            return get_runs(self._json[filename])
+
+        position, nb_runs = self._index[filename]
+        runs = list()
+
+        for _ in range(nb_runs):
+            begin, source_length, target_length = RUN_STRUCT.unpack_from(self._mmap, position)
+            position += RUN_STRUCT.size
+
+            source = self._mmap[position:position + source_length].decode("UTF-8")
+            position += source_length
+
+            target = self._mmap[position:position + target_length].decode("UTF-8")
+            position += target_length
+
+            runs.append((begin, source, target))
+
+        return runs
+
+    def __contains__(self, filename) -> bool:
+        if self._json is not None:
+            return filename in self._json
+
+        return filename in self._index
+
+    def __iter__(self):
+        if self._json is not None:
+            return iter(self._json)
+
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        if self._json is not None:
+            return len(self._json)
+
+        return len(self._index)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
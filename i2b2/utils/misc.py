@@ -22,37 +22,47 @@ def find_ngrams(input_list: list, n: int) -> list:
         return list(zip(*[input_list[i:] for i in range(n)]))
 
 
-def replace_semantic_types(input_dir: str, output_dir: str) -> None:
+def replace_semantic_types(input_dir: str, output_dir: str, source_filepaths: list = None) -> None:
     """
     Replace semantic types for evaluation with the i2b2 script
 
     Args:
         input_dir (str): path where gold standard files are stored (flattened version)
         output_dir (str): path where new files will be created
+        source_filepaths (list): files to process (e.g. from the corpus manifest), input_dir is walked if None
 
     Returns:
         None
     """
 
-    for root, dirs, files in os.walk(os.path.abspath(input_dir)):
-        for filename in files:
-            subdir = remove_abs(re.sub(re.escape(os.path.abspath(input_dir)), "", root))
+    if source_filepaths is None:
+        source_filepaths = [
+            os.path.join(root, filename)
+            for root, dirs, files in os.walk(os.path.abspath(input_dir))
+            for filename in files
+        ]
 
-            source_file = os.path.join(root, filename)
+    target_subdirs = set()
 
-            target_subdir = os.path.join(os.path.abspath(output_dir), subdir)
-            target_file = os.path.join(target_subdir, filename)
+    for source_file in source_filepaths:
+        root, filename = os.path.split(source_file)
+        subdir = remove_abs(re.sub(re.escape(os.path.abspath(input_dir)), "", root))
 
+        target_subdir = os.path.join(os.path.abspath(output_dir), subdir)
+        target_file = os.path.join(target_subdir, filename)
+
+        if target_subdir not in target_subdirs:
             ensure_dir(target_subdir)
+            target_subdirs.add(target_subdir)
 
-            with open(source_file, "r", encoding="UTF-8") as input_file:
-                content = input_file.read()
+        with open(source_file, "r", encoding="UTF-8") as input_file:
+            content = input_file.read()
 
-            with open(target_file, "w", encoding="UTF-8") as output_file:
-                if re.match("^.*\.chains$", filename):
-                    content = re.sub("coref\s[^\"]*", "coref procedure", content)
+        with open(target_file, "w", encoding="UTF-8") as output_file:
+            if re.match("^.*\.chains$", filename):
+                content = re.sub("coref\s[^\"]*", "coref procedure", content)
 
-                elif re.match("^.*\.con$", filename):
-                    content = re.sub("t=\"[^\"]*\"", "t=\"procedure\"", content)
+            elif re.match("^.*\.con$", filename):
+                content = re.sub("t=\"[^\"]*\"", "t=\"procedure\"", content)
 
-                output_file.write(content)
+            output_file.write(content)
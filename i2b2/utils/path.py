@@ -1,4 +1,20 @@
+import errno
+import hashlib
 import os
+import shutil
+import stat
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Ways of making a file available at another path, see materialize_file
+LINK_MODES = ("copy", "hardlink", "reflink", "symlink")
+
+# ioctl request cloning the extents of a file on copy-on-write filesystems (Linux, e.g. Btrfs or XFS)
+FICLONE = 0x40049409
 
 
 def ensure_dir(directory: str) -> None:
@@ -55,3 +71,176 @@ def remove_abs(path: str) -> str:
         return path.lstrip("/")
     else:
         return path
+
+
+def concatenate_files(source_filepaths: list, target_filepath: str, buffer_size: int = 1024 * 1024) -> None:
+    """
+    Concatenate files into a target file. Bytes are copied by the kernel (copy_file_range or sendfile) when the
+    platform allows it, with large buffered copies otherwise.
+
+    Args:
+        source_filepaths (list): files to concatenate, in order
+        target_filepath (str): target filepath
+        buffer_size (int): buffer size used when the kernel copy is not available
+
+    Returns:
+        None
+    """
+
+    # Unbuffered files: positions are the file descriptor offsets, which are moved by the kernel copies
+    with open(target_filepath, "wb", buffering=0) as output_file:
+        for source_filepath in source_filepaths:
+            with open(source_filepath, "rb", buffering=0) as input_file:
+                copy_file_content(input_file, output_file, buffer_size=buffer_size)
+
+
+def copy_file_content(input_file, output_file, buffer_size: int = 1024 * 1024) -> None:
+    """
+    Append the content of an unbuffered binary file to another one, from their current positions
+
+    Args:
+        input_file (file): unbuffered binary file opened for reading
+        output_file (file): unbuffered binary file opened for writing
+        buffer_size (int): buffer size used when the kernel copy is not available
+
+    Returns:
+        None
+    """
+
+    remaining = os.fstat(input_file.fileno()).st_size - input_file.tell()
+
+    for copy_function in [getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)]:
+        if copy_function is None:
+            continue
+
+        try:
+            while remaining > 0:
+                if copy_function is os.sendfile:
+                    copied = copy_function(output_file.fileno(), input_file.fileno(), None, remaining)
+                else:
+                    copied = copy_function(input_file.fileno(), output_file.fileno(), remaining)
+
+                if copied == 0:
+                    return
+
+                remaining -= copied
+
+            return
+
+        except OSError:
+            # Not supported between these files, the next method resumes from the current positions
+            continue
+
+    shutil.copyfileobj(input_file, output_file, buffer_size)
+
+
+def get_file_hash(filepath: str, buffer_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hash of a file content
+
+    Args:
+        filepath (str): filepath
+        buffer_size (int): size of the chunks read from the file
+
+    Returns:
+        str: hexadecimal digest
+    """
+
+    file_hash = hashlib.sha256()
+
+    with open(filepath, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(buffer_size), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def copy_file_mode(input_file, target_filepath: str) -> None:
+    """
+    Copy the permission bits of an open source file to a target file, as shutil.copy does. Nothing is done when the
+    source is not a file on disk (e.g. an archive member)
+
+    Args:
+        input_file: source file object
+        target_filepath (str): target filepath
+    """
+
+    try:
+        mode = os.fstat(input_file.fileno()).st_mode
+    except (AttributeError, OSError):
+        return
+
+    os.chmod(target_filepath, stat.S_IMODE(mode))
+
+
+def remove_file(filepath: str) -> None:
+    """
+    Remove a file or a link if it exists. Files which may be links to other files are removed before being written,
+    writing them in place would modify the files they are linked to
+
+    Args:
+        filepath (str): filepath
+    """
+
+    if os.path.lexists(filepath):
+        os.remove(filepath)
+
+
+def materialize_file(source_filepath: str, target_filepath: str, link_mode: str = "copy") -> str:
+    """
+    Make a file available at another path by copying or linking it. An existing target file is replaced, it is never
+    written in place since it may be a link to another file. Links fall back to a copy when they are not supported
+    (e.g. across devices or on filesystems without copy-on-write)
+
+    Args:
+        source_filepath (str): source filepath
+        target_filepath (str): target filepath
+        link_mode (str): copy, hardlink, reflink (copy-on-write clone) or symlink (relative symbolic link)
+
+    Returns:
+        str: target filepath
+    """
+
+    if link_mode not in LINK_MODES:
+        raise ValueError("Unknown link mode: {}".format(link_mode))
+
+    remove_file(target_filepath)
+
+    try:
+        if link_mode == "hardlink":
+            os.link(source_filepath, target_filepath)
+            return target_filepath
+
+        elif link_mode == "symlink":
+            os.symlink(os.path.relpath(os.path.abspath(source_filepath),
+                                       os.path.dirname(os.path.abspath(target_filepath))), target_filepath)
+            return target_filepath
+
+        elif link_mode == "reflink":
+            clone_file(source_filepath, target_filepath)
+            return target_filepath
+
+    except OSError:
+        # Not supported, the file is copied
+        remove_file(target_filepath)
+
+    return shutil.copy(source_filepath, target_filepath)
+
+
+def clone_file(source_filepath: str, target_filepath: str) -> None:
+    """
+    Clone a file with the FICLONE ioctl: both files share their data blocks until one of them is modified
+
+    Args:
+        source_filepath (str): source filepath
+        target_filepath (str): target filepath
+    """
+
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+
+    with open(source_filepath, "rb") as input_file:
+        with open(target_filepath, "wb") as output_file:
+            fcntl.ioctl(output_file.fileno(), FICLONE, input_file.fileno())
+
+    shutil.copymode(source_filepath, target_filepath)
@@ -0,0 +1,41 @@
+def get_process_pool(workers: int):
+    """
+    Create a pool of worker processes. multiprocessing is only imported when a pool is needed since it is slow to
+    import
+
+    Args:
+        workers (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: process pool
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def map_workers(function, *all_args, workers: int = 1):
+    """
+    Apply a function to the items of several sequences, like map. With several workers and items, the calls are
+    spread over worker processes.
+
+    Args:
+        function (callable): function to apply, must be picklable when workers > 1
+        *all_args (list): sequences of function arguments
+        workers (int): number of worker processes
+
+    Returns:
+        generator: function results, in the order of the items
+    """
+
+    # No sequence at all is handled as empty sequences
+    nb_items = min(map(len, all_args), default=0)
+    if nb_items == 0:
+        return
+
+    if workers > 1 and nb_items > 1:
+        with get_process_pool(min(workers, nb_items)) as executor:
+            yield from executor.map(function, *all_args)
+    else:
+        yield from map(function, *all_args)
@@ -1,29 +1,23 @@
+from bisect import bisect_left, bisect_right
+from typing import Sequence, Tuple
 
-def overlap(e1_start: int, e1_end: int, e2_start: int, e2_end: int) -> bool:
+
+def get_covered_range(begin: int, end: int, token_begins: Sequence[int], token_ends: Sequence[int]) -> Tuple[int, int]:
     """
-    Check if two spans overlap with each other
+    Find the tokens entirely covered by a span using a sorted token offset index
 
     Args:
-        e1_start (int): span 1 begin offset
-        e1_end (int): span 1 end offset
-        e2_start (int): span 2 begin offset
-        e2_end (int): span 2 end offset
+        begin (int): span begin offset
+        end (int): span end offset
+        token_begins (Sequence[int]): sorted token begin offsets
+        token_ends (Sequence[int]): sorted token end offsets
 
     Returns:
-        bool: True if they overlap, False otherwise
+        (int, int): index of the first covered token and index following the last covered token
 
     """
 
-    if e1_start <= e2_start < e2_end <= e1_end:
-        return True
-
-    elif e2_start <= e1_start < e1_end <= e2_end:
-        return True
-
-    elif e1_start <= e2_start < e1_end <= e2_end:
-        return True
-
-    elif e2_start <= e1_start < e2_end <= e1_end:
-        return True
+    first = bisect_left(token_begins, begin)
+    last = bisect_right(token_ends, end)
 
-    return False
+    return first, max(first, last)
@@ -0,0 +1,352 @@
+import hashlib
+import logging
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+from itertools import accumulate, chain, compress, count, repeat
+from operator import add, mul, ne, sub
+
+from .path import get_other_extension
+
+# Sidecar files are invalidated when the tokenization rules change
+SPLITS_MAGIC = b"I2B2SPL1"
+SPLITS_EXTENSION = "splits"
+
+# Every whitespace character separates two chunks. Separators other than newlines are replaced with spaces before
+# splitting: ASCII ones with str.replace, the others with a regular expression
+ASCII_SEPARATORS = "".join(c for c in map(chr, range(128)) if c.isspace() and c not in " \n")
+REGEX_SEPARATOR = re.compile(r"[^\S\n]")
+
+
+def get_splits(doc_filepath: str) -> "Splits":
+    """
+    Extract character-offset--i2b2-offset mapping for a given document
+
+    Args:
+        doc_filepath (str): document filepath
+
+    Returns:
+        Splits: mapping
+    """
+
+    with open(doc_filepath, "r", encoding="UTF-8") as input_file:
+        content = input_file.read()
+
+    return get_content_splits(content)
+
+
+def get_content_splits(content: str) -> "Splits":
+    """
+    Extract character-offset--i2b2-offset mapping for a given document content.
+    Lines are delimited by newline characters only, as when iterating over a file opened in text mode. Each
+    whitespace character is a token separator and lines starting with a whitespace character (including empty lines)
+    begin with a zero-length token.
+
+    The whole document is split at once and offsets are computed with iterator pipelines over the chunks, no Python
+    code runs per token.
+
+    Args:
+        content (str): document content
+
+    Returns:
+        Splits: mapping
+    """
+
+    spaced = replace_separators(content)
+
+    # Number of chunks of each line, chunks being separated by single characters
+    line_sizes = list(map(add, map(str.count, spaced.split("\n"), repeat(" ")), repeat(1)))
+    chunks = spaced.replace("\n", " ").split(" ")
+
+    # Keeping non-empty chunks and zero-length chunks starting a line, the chunk following a trailing line break
+    # or ending the document is not part of any line
+    kept = list(map(bool, chunks))
+    for line_start in accumulate(line_sizes[:-1], initial=0):
+        kept[line_start] = True
+    if len(chunks[-1]) == 0:
+        kept[-1] = False
+
+    lengths = list(map(len, chunks))
+
+    token_begins = list(compress(accumulate(map(add, lengths, repeat(1)), initial=0), kept))
+    token_ends = list(map(add, token_begins, compress(lengths, kept)))
+    token_lines = list(compress(chain.from_iterable(map(repeat, count(1), line_sizes)), kept))
+
+    return Splits(content, array("i", token_begins), array("i", token_ends), array("i", token_lines))
+
+
+def replace_separators(content: str) -> str:
+    """
+    Replace the whitespace characters of a document, other than newlines, with spaces
+
+    Args:
+        content (str): document content
+
+    Returns:
+        str: content where chunks are separated by spaces and lines by newlines
+    """
+
+    if content.isascii():
+        for separator in ASCII_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, " ")
+
+        return content
+
+    return REGEX_SEPARATOR.sub(" ", content)
+
+
+def get_line_tokens(line: str) -> list:
+    """
+    Split a line into token strings: the first chunk, even if empty, and the non-empty chunks which follow
+
+    Args:
+        line (str): line where chunks are separated by spaces
+
+    Returns:
+        list: token strings
+    """
+
+    chunks = line.split(" ")
+    tokens = chunks[:1]
+    tokens.extend(filter(None, chunks[1:]))
+
+    return tokens
+
+
+class Splits(Mapping):
+    """
+    Character-offset--i2b2-offset mapping of a document backed by parallel token arrays sorted by offset.
+    It behaves like a dict mapping line numbers to lists of (token, begin offset, end offset) tuples. The lists of
+    all lines are built in one pass on first access.
+    """
+
+    __slots__ = ("content", "begins", "ends", "lines", "_cache")
+
+    def __init__(self, content: str, begins: array, ends: array, lines: array):
+
+        self.content = content
+        self.begins = begins
+        self.ends = ends
+        self.lines = lines
+
+        self._cache = None
+
+    @property
+    def tokens(self) -> "TokenView":
+        """
+        Token strings, sliced from the content on access
+        """
+
+        return TokenView(self.content, self.begins, self.ends)
+
+    @property
+    def indices(self) -> array:
+        """
+        Token indices within their line (i2b2 token offsets)
+        """
+
+        # Distance of each token to the first token of its line, the index of the first token being propagated with a
+        # running maximum
+        line_starts = chain([True], map(ne, self.lines[1:], self.lines[:-1]))
+        line_firsts = accumulate(map(mul, range(len(self.lines)), line_starts), max)
+
+        return array("i", map(sub, range(len(self.lines)), line_firsts))
+
+    def get_line_range(self, line_counter: int) -> tuple:
+        """
+        Get the token range of a line
+
+        Args:
+            line_counter (int): line number
+
+        Returns:
+            (int, int): index of the first token of the line and index following its last token
+        """
+
+        return bisect_left(self.lines, line_counter), bisect_right(self.lines, line_counter)
+
+    def get_token_position(self, line_counter: int, token_counter: int) -> int:
+        """
+        Get the position of a token in the token arrays from its i2b2 offset
+
+        Args:
+            line_counter (int): line number
+            token_counter (int): token index within the line
+
+        Returns:
+            int: token position
+        """
+
+        first, last = self.get_line_range(line_counter)
+
+        if not 0 <= token_counter < last - first:
+            raise IndexError("No token {}:{}".format(line_counter, token_counter))
+
+        return first + token_counter
+
+    def __getitem__(self, line_counter: int) -> list:
+        if self._cache is None:
+            # Token strings are split again from the content, which is faster than slicing them one by one. Each line
+            # takes as many offsets from the shared iterators as it has tokens, the trailing empty line following a
+            # final newline is left out by the line numbers
+            all_begins = iter(self.begins)
+            all_ends = iter(self.ends)
+            line_tokens = map(get_line_tokens, replace_separators(self.content).split("\n"))
+
+            self._cache = dict(zip(range(1, len(self) + 1),
+                                   map(list, map(zip, line_tokens, repeat(all_begins), repeat(all_ends)))))
+
+        return self._cache[line_counter]
+
+    def __iter__(self):
+        return iter(range(1, len(self) + 1))
+
+    def __len__(self) -> int:
+        # Every line holds at least one token
+        return self.lines[-1] if len(self.lines) > 0 else 0
+
+
+class TokenView(Sequence):
+    """
+    Lazy view over the token strings of a document: strings are sliced from the content when accessed, only the
+    offset arrays are stored
+    """
+
+    __slots__ = ("content", "begins", "ends")
+
+    def __init__(self, content: str, begins: array, ends: array):
+
+        self.content = content
+        self.begins = begins
+        self.ends = ends
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return TokenView(self.content, self.begins[k], self.ends[k])
+
+        return self.content[self.begins[k]:self.ends[k]]
+
+    def __iter__(self):
+        return map(self.content.__getitem__, map(slice, self.begins, self.ends))
+
+    def __len__(self) -> int:
+        return len(self.begins)
+
+
+def get_content_hash(content: str) -> bytes:
+    """
+    Compute the digest used to validate a tokenization sidecar file
+
+    Args:
+        content (str): document content
+
+    Returns:
+        bytes: content digest
+    """
+
+    return hashlib.sha1(content.encode("UTF-8")).digest()
+
+
+def dump_splits(splits: Splits, splits_filepath: str) -> None:
+    """
+    Write a character-offset--i2b2-offset mapping to a compact sidecar file.
+    The file contains the content digest followed by the token begin offsets, end offsets and line numbers. It is
+    written to a temporary file which then replaces the sidecar, an interrupted run never leaves a truncated sidecar.
+
+    Args:
+        splits (Splits): mapping
+        splits_filepath (str): sidecar filepath
+    """
+
+    nb_tokens = array("i", [len(splits.begins)])
+
+    # Per-process name, documents may be processed by several workers
+    tmp_filepath = "{}.{}.tmp".format(splits_filepath, os.getpid())
+
+    try:
+        with open(tmp_filepath, "wb") as output_file:
+            output_file.write(SPLITS_MAGIC)
+            output_file.write(get_content_hash(splits.content))
+            nb_tokens.tofile(output_file)
+            splits.begins.tofile(output_file)
+            splits.ends.tofile(output_file)
+            splits.lines.tofile(output_file)
+
+        os.replace(tmp_filepath, splits_filepath)
+
+    except BaseException:
+        if os.path.lexists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+
+
+def load_splits(content: str, splits_filepath: str):
+    """
+    Load a character-offset--i2b2-offset mapping from a sidecar file
+
+    Args:
+        content (str): document content
+        splits_filepath (str): sidecar filepath
+
+    Returns:
+        Splits: mapping, None if the sidecar does not exist or is outdated
+    """
+
+    if not os.path.isfile(splits_filepath):
+        return None
+
+    with open(splits_filepath, "rb") as input_file:
+        if input_file.read(len(SPLITS_MAGIC)) != SPLITS_MAGIC:
+            return None
+
+        if input_file.read(hashlib.sha1().digest_size) != get_content_hash(content):
+            return None
+
+        nb_tokens = array("i")
+        token_begins = array("i")
+        token_ends = array("i")
+        token_lines = array("i")
+
+        try:
+            nb_tokens.fromfile(input_file, 1)
+            token_begins.fromfile(input_file, nb_tokens[0])
+            token_ends.fromfile(input_file, nb_tokens[0])
+            token_lines.fromfile(input_file, nb_tokens[0])
+        except EOFError:
+            return None
+
+    return Splits(content, token_begins, token_ends, token_lines)
+
+
+def get_cached_splits(doc_filepath: str) -> tuple:
+    """
+    Fetch the character-offset--i2b2-offset mapping of a document from its sidecar file.
+    The mapping is computed and the sidecar (re)written when it is missing or when the document content changed.
+    Sidecars are only a cache: when one cannot be written (e.g. read-only directory), the mapping is still returned.
+
+    Args:
+        doc_filepath (str): document filepath
+
+    Returns:
+        (str, Splits): document content and mapping
+    """
+
+    splits_filepath = get_other_extension(doc_filepath, SPLITS_EXTENSION)
+
+    with open(doc_filepath, "r", encoding="UTF-8") as input_file:
+        content = input_file.read()
+
+    splits = load_splits(content, splits_filepath)
+
+    if splits is None:
+        splits = get_content_splits(content)
+
+        try:
+            dump_splits(splits, splits_filepath)
+        except OSError as e:
+            logging.warning("Cannot write tokenization sidecar {}: {}".format(splits_filepath, e))
+
+    return content, splits
@@ -1,5 +1,4 @@
 import argparse
-import json
 import logging
 import os
 import re
@@ -8,13 +7,10 @@ import sys
 import time
 from datetime import timedelta
 
-from i2b2.brat import generate_brat_files, i2b2_to_brat, generate_brat_conf_files
-from i2b2.conll import conll_to_i2b2, conll_files_task1c
-from i2b2.conll import create_conll_files
-from i2b2.offset import create_offset_mapping
-from i2b2.prepare import prepare_data_task1c
-from i2b2.utils.misc import replace_semantic_types
-from i2b2.utils.path import ensure_dir
+from i2b2.utils.folds import DEFAULT_SEED
+from i2b2.utils.path import LINK_MODES, concatenate_files, ensure_dir, materialize_file
+
+# Sub-command dependencies are imported in their respective branches to keep the startup time low
 
 if __name__ == "__main__":
 
@@ -30,6 +26,8 @@ if __name__ == "__main__":
     parser_conll_to_i2b2.add_argument("--output-dir", help="", dest="output_dir", type=str, required=True)
     parser_conll_to_i2b2.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                       action="store_true")
+    parser_conll_to_i2b2.add_argument("--workers", help="Number of worker processes", dest="workers", type=int,
+                                      default=1)
 
     parser_brat = subparsers.add_parser("CREATE-BRAT", help="Create brat version of the corpus")
     parser_brat.add_argument("--input-dir", help="Directory where data is stored (step 1)", dest="input_dir",
@@ -38,12 +36,31 @@ if __name__ == "__main__":
                              type=str, required=True)
     parser_brat.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                              action="store_true")
+    parser_brat.add_argument("--workers", help="Number of worker processes", dest="workers", type=int, default=1)
 
     parser_conll_files = subparsers.add_parser('CREATE-CONLL', help="Create CoNLL version of the corpus")
     parser_conll_files.add_argument("--input-dir", help="Directory where data is stored (step 2)",
                                     dest="input_dir", type=str, required=True)
     parser_conll_files.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                     action="store_true")
+    parser_conll_files.add_argument("--workers", help="Number of worker processes", dest="workers", type=int,
+                                    default=1)
+    parser_conll_files.add_argument("--split", help="Additional train/dev split of the training documents, "
+                                                     "NAME=holdout:DEV_SIZE or NAME=kfold:NB_FOLDS (repeatable)",
+                                    dest="splits", type=str, action="append", default=list())
+    parser_conll_files.add_argument("--seed", help="Seed of the train/dev splits", dest="seed", type=int,
+                                    default=DEFAULT_SEED)
+    parser_conll_files.add_argument("--no-document-files", help="Only write aggregated CoNLL files",
+                                    dest="write_documents", action="store_false")
+
+    parser_convert_mapping = subparsers.add_parser('CONVERT-MAPPING', help="Convert a JSON character mapping file "
+                                                                            "to the binary format")
+    parser_convert_mapping.add_argument("--input-file", help="JSON mapping filepath", dest="input_file", type=str,
+                                        required=True)
+    parser_convert_mapping.add_argument("--output-file", help="Binary mapping filepath", dest="output_file",
+                                        type=str, required=True)
+    parser_convert_mapping.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
+                                        action="store_true")
 
     parser_file_mapping = subparsers.add_parser('CREATE-MAPPING', help="Create character mapping file")
     parser_file_mapping.add_argument("--source-dir", help="Directory where untouched txt files are stored",
@@ -51,6 +68,10 @@ if __name__ == "__main__":
     parser_file_mapping.add_argument("--modified-dir", help="Directory where altered text files are stored",
                                      dest="modified_dir", type=str, required=True)
     parser_file_mapping.add_argument("--target-file", help="Output mapping filepath", dest="target_file", type=str)
+    parser_file_mapping.add_argument("--format", help="Output mapping file format", dest="format", type=str,
+                                     choices=["json", "binary"], default="json")
+    parser_file_mapping.add_argument("--workers", help="Number of worker processes", dest="workers", type=int,
+                                     default=1)
     parser_file_mapping.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                      action="store_true")
 
@@ -64,12 +85,24 @@ if __name__ == "__main__":
                                      dest="correction_file", type=str, required=True)
     parser_prepare_data.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                      action="store_true")
+    parser_prepare_data.add_argument("--streaming", help="Read files directly from the archives, without decompressing "
+                                                         "them", dest="streaming", action="store_true")
+    parser_prepare_data.add_argument("--workers", help="Number of worker processes", dest="workers", type=int,
+                                     default=1)
+    parser_prepare_data.add_argument("--incremental", help="Only process the archives and documents which have changed "
+                                                           "since the last run", dest="incremental",
+                                     action="store_true")
+    parser_prepare_data.add_argument("--link-mode", help="How flattened files are created from sorted files",
+                                     dest="link_mode", choices=LINK_MODES, default="copy")
 
     parser_regroup = subparsers.add_parser("REGROUP-FILES", help="Regroup files for mapping creation")
     parser_regroup.add_argument("--input-dir", help="Directory where data is stored", dest="input_dir",
                                 type=str, required=True)
     parser_regroup.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                 action="store_true")
+    parser_regroup.add_argument("--link-mode", help="How untouched files are created from flattened files, modified "
+                                                    "files are reflinked or copied", dest="link_mode",
+                                choices=LINK_MODES, default="copy")
 
     parser_remove = subparsers.add_parser('REMOVE-TYPES', help="Change all semantic types to procedure")
     parser_remove.add_argument("--input-dir", help="Path where prepared data is stored", dest="input_dir",
@@ -88,6 +121,10 @@ if __name__ == "__main__":
                                      type=str, required=True)
     parser_run_to_conll.add_argument("--overwrite", help="Overwrite existing documents", dest="overwrite",
                                      action="store_true")
+    parser_run_to_conll.add_argument("--workers", help="Number of worker processes", dest="workers", type=int,
+                                     default=1)
+    parser_run_to_conll.add_argument("--no-document-files", help="Only write the aggregated CoNLL file",
+                                     dest="write_documents", action="store_false")
 
     args = parser.parse_args()
 
@@ -103,6 +140,8 @@ if __name__ == "__main__":
 
     if args.subparser_name == "CONLL-TO-I2B2":
 
+        from i2b2.conll import conll_to_i2b2
+
         if not os.path.isdir(args.input_dir):
             raise NotADirectoryError("The input path does not exist: {}".format(
                 os.path.abspath(args.input_dir)
@@ -122,11 +161,14 @@ if __name__ == "__main__":
 
         conll_to_i2b2(
             os.path.abspath(args.input_dir),
-            os.path.abspath(args.output_dir)
+            os.path.abspath(args.output_dir),
+            workers=args.workers
         )
 
     elif args.subparser_name == "CREATE-BRAT":
 
+        from i2b2.brat import generate_brat_files
+
         if not os.path.isfile(os.path.abspath(args.mapping_file)):
             raise NotADirectoryError("The mapping file does not exist: {}".format(
                 os.path.abspath(args.mapping_file)
@@ -148,11 +190,18 @@ if __name__ == "__main__":
         generate_brat_files(
             input_dir=os.path.abspath(args.input_dir),
             output_dir=os.path.abspath(output_dir),
-            mapping_file_path=os.path.abspath(args.mapping_file)
+            mapping_file_path=os.path.abspath(args.mapping_file),
+            workers=args.workers
         )
 
     elif args.subparser_name == "CREATE-CONLL":
 
+        from i2b2.conll import create_conll_files
+        from i2b2.utils.corpus import get_corpus_filepaths
+        from i2b2.utils.folds import parse_split_configs
+
+        split_configs = parse_split_configs(args.splits)
+
         brat_dir = os.path.join(os.path.abspath(args.input_dir), "brat-raw")
         if not os.path.isdir(brat_dir):
             raise NotADirectoryError("The brat directory does not exist: {}".format(
@@ -180,12 +229,38 @@ if __name__ == "__main__":
 
         create_conll_files(
             brat_dir=brat_dir,
-            gs_dir=gs_dir,
             output_dir=output_dir,
+            workers=args.workers,
+            split_configs=split_configs,
+            seed=args.seed,
+            write_documents=args.write_documents,
+            source_filepaths=get_corpus_filepaths(args.input_dir, ["brat/ann", "brat/txt"])
+        )
+
+    elif args.subparser_name == "CONVERT-MAPPING":
+
+        from i2b2.utils.mapping import convert_char_mapping
+
+        if not os.path.isfile(os.path.abspath(args.input_file)):
+            raise FileNotFoundError("The mapping file does not exist: {}".format(
+                os.path.abspath(args.input_file)
+            ))
+
+        if not args.overwrite:
+            if os.path.isfile(os.path.abspath(args.output_file)):
+                raise FileExistsError("The output file already exists: {}".format(
+                    os.path.abspath(args.output_file)
+                ))
+
+        convert_char_mapping(
+            os.path.abspath(args.input_file),
+            os.path.abspath(args.output_file)
         )
 
     elif args.subparser_name == "CREATE-MAPPING":
 
+        from i2b2.offset import create_offset_mapping
+
         if not os.path.isdir(os.path.abspath(args.source_dir)):
             raise NotADirectoryError("The input directory does not exist: {}".format(
                 os.path.abspath(args.source_dir)
@@ -208,11 +283,15 @@ if __name__ == "__main__":
         create_offset_mapping(
             os.path.abspath(args.source_dir),
             os.path.abspath(args.modified_dir),
-            os.path.abspath(args.target_file)
+            os.path.abspath(args.target_file),
+            mapping_format=args.format,
+            workers=args.workers
         )
 
     elif args.subparser_name == "PREPARE-DATA":
 
+        from i2b2.prepare import get_prepare_manifest_path, prepare_data_task1c
+
         if not os.path.isdir(os.path.abspath(args.zip_dir)):
             raise NotADirectoryError("The source directory does not exist: {}".format(
                 os.path.abspath(args.zip_dir)
@@ -223,14 +302,17 @@ if __name__ == "__main__":
                 os.path.abspath(args.correction_file)
             ))
 
-        if not args.overwrite:
+        # Incremental runs update the output directory of a previous run
+        incremental = args.incremental and os.path.isfile(get_prepare_manifest_path(args.output_dir))
+
+        if not args.overwrite and not incremental:
             if os.path.isdir(os.path.abspath(args.output_dir)):
                 logging.info("The output directory already exists, use the appropriate flag to overwrite")
                 raise IsADirectoryError("The output directory already exists: {}".format(
                     os.path.abspath(args.output_dir)
                 ))
 
-        if os.path.isdir(os.path.abspath(args.output_dir)):
+        if os.path.isdir(os.path.abspath(args.output_dir)) and not incremental:
             shutil.rmtree(os.path.abspath(args.output_dir))
 
         ensure_dir(args.output_dir)
@@ -238,11 +320,17 @@ if __name__ == "__main__":
         prepare_data_task1c(
             input_dir=os.path.abspath(args.zip_dir),
             output_dir=os.path.abspath(args.output_dir),
-            correction_file=os.path.abspath(args.correction_file)
+            correction_file=os.path.abspath(args.correction_file),
+            streaming=args.streaming,
+            workers=args.workers,
+            incremental=incremental,
+            link_mode=args.link_mode
         )
 
     elif args.subparser_name == "REGROUP-FILES":
 
+        from i2b2.utils.corpus import get_corpus_filepaths
+
         input_dir = os.path.join(os.path.abspath(args.input_dir), "gold-standard-flatten")
         if not os.path.isdir(input_dir):
             raise NotADirectoryError("The input directory does not exists: {}".format(
@@ -268,18 +356,34 @@ if __name__ == "__main__":
         ensure_dir(target_modified_dir)
         ensure_dir(target_untouched_dir)
 
-        for root, dirs, files in os.walk(input_dir):
-            for filename in files:
-                if re.match("^.*\.txt$", filename):
-                    source_txt_filepath = os.path.join(root, filename)
-                    target_modified_filepath = os.path.join(target_modified_dir, filename)
-                    target_untouched_filepath = os.path.join(target_untouched_dir, filename)
+        # Modified files are edited in place, they must not share their content with the source files
+        modified_link_mode = "copy" if args.link_mode == "copy" else "reflink"
+
+        # Flattened text files, from the corpus manifest if available
+        all_txt_filepaths = get_corpus_filepaths(args.input_dir, ["flatten/docs"])
 
-                    shutil.copy(source_txt_filepath, target_modified_dir)
-                    shutil.copy(source_txt_filepath, target_untouched_dir)
+        if all_txt_filepaths is not None:
+            all_txt_filepaths = [source_txt_filepath for source_txt_filepath, in all_txt_filepaths]
+        else:
+            all_txt_filepaths = [
+                os.path.join(root, filename)
+                for root, dirs, files in os.walk(input_dir)
+                for filename in files if re.match("^.*\.txt$", filename)
+            ]
+
+        for source_txt_filepath in all_txt_filepaths:
+            filename = os.path.basename(source_txt_filepath)
+            target_modified_filepath = os.path.join(target_modified_dir, filename)
+            target_untouched_filepath = os.path.join(target_untouched_dir, filename)
+
+            materialize_file(source_txt_filepath, target_modified_filepath, link_mode=modified_link_mode)
+            materialize_file(source_txt_filepath, target_untouched_filepath, link_mode=args.link_mode)
 
     elif args.subparser_name == "REMOVE-TYPES":
 
+        from i2b2.utils.corpus import get_corpus_filepaths
+        from i2b2.utils.misc import replace_semantic_types
+
         input_dir = os.path.join(os.path.abspath(args.input_dir), "gold-standard-flatten")
         if not os.path.isdir(input_dir):
             raise NotADirectoryError("The input directory does not exists: {}".format(
@@ -299,10 +403,19 @@ if __name__ == "__main__":
 
         ensure_dir(output_dir)
 
-        replace_semantic_types(input_dir, output_dir)
+        # Flattened files of each document, from the corpus manifest
+        source_filepaths = get_corpus_filepaths(args.input_dir, ["flatten/docs", "flatten/concepts", "flatten/chains"])
+        if source_filepaths is not None:
+            source_filepaths = [filepath for filepaths in source_filepaths for filepath in filepaths]
+
+        replace_semantic_types(input_dir, output_dir, source_filepaths=source_filepaths)
 
     elif args.subparser_name == "RUN-TO-CONLL":
 
+        from i2b2.brat import i2b2_to_brat, generate_brat_conf_files
+        from i2b2.conll import conll_files_task1c, get_conll_index_entry, write_conll_index
+        from i2b2.utils.mapping import load_char_mapping
+
         if not os.path.isfile(os.path.abspath(args.mapping_file)):
             raise NotADirectoryError("The mapping file does not exist: {}".format(
                 os.path.abspath(args.mapping_file)
@@ -337,29 +450,29 @@ if __name__ == "__main__":
         ensure_dir(conll_dir)
 
         # Loading character mapping
-        with open(os.path.abspath(args.mapping_file), "r", encoding="UTF-8") as input_file:
-            char_mapping = json.load(input_file)
-
-        i2b2_to_brat(os.path.abspath(args.input_dir),
-                     brat_dir,
-                     char_mapping)
+        with load_char_mapping(os.path.abspath(args.mapping_file)) as char_mapping:
+            i2b2_to_brat(os.path.abspath(args.input_dir),
+                         brat_dir,
+                         char_mapping,
+                         workers=args.workers)
 
         generate_brat_conf_files(brat_dir)
 
-        conll_files_task1c(brat_dir=brat_dir,
-                           gs_dir=os.path.abspath(args.gs_conll_dir),
-                           output_dir=conll_dir)
+        all_documents = conll_files_task1c(brat_dir=brat_dir,
+                                           output_dir=conll_dir,
+                                           workers=args.workers,
+                                           write_documents=args.write_documents)
 
         target_conll_file = os.path.join(os.path.abspath(args.output_dir), "all.conll")
 
-        with open(target_conll_file, "w", encoding="UTF-8") as output_file:
-            for dirname in os.listdir(conll_dir):
-                for root, dirs, files in os.walk(os.path.join(conll_dir, dirname)):
-                    for filename in files:
-                        if re.match("^.*\.conll$", filename):
-                            with open(os.path.join(root, filename), "r", encoding="UTF-8") as input_file:
-                                for line in input_file:
-                                    output_file.write(line)
+        if args.write_documents:
+            # Concatenating document files, bytes are copied by the kernel
+            concatenate_files([document_conll_file for document_conll_file, _ in all_documents], target_conll_file)
+        else:
+            with open(target_conll_file, "w", encoding="UTF-8") as output_file:
+                output_file.writelines(block for _, block in all_documents)
+
+        write_conll_index([get_conll_index_entry(block) for _, block in all_documents], target_conll_file)
 
     end = time.time()
 